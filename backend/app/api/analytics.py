@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date
+from ..db import tenancy
+from ..models import models
+from ..services import archive, export
+from .deps import check_role, get_read_db
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+@router.get("/export/{dataset}")
+def export_dataset(
+    dataset: str,
+    fmt: str = Query("arrow", alias="format", pattern="^(arrow|parquet)$"),
+    columns: Optional[str] = Query(None, description="Comma separated column names, defaults to all"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(check_role([models.UserRole.ADMIN, models.UserRole.MANAGER, models.UserRole.ANALYST]))
+):
+    if dataset not in archive.TIERS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset, expected one of {', '.join(archive.TIERS)}")
+    if not export.available():
+        raise HTTPException(status_code=501, detail="Analytics exports require pyarrow to be installed")
+
+    # 1. Resolve projection
+    allowed = export.column_names(dataset)
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else allowed
+    unknown = [c for c in selected if c not in allowed]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}" if unknown else "No columns selected")
+
+    # 2. Build the SQL, reading the archive only when the range needs it
+    with_archive = archive.needs_archive(db, dataset, start_date, end_date)
+    names = export.sql_columns(dataset, selected)
+    query = export.build_query(dataset, names, start_date, end_date, with_archive, tenancy.session_tenant(db))
+    arrow_schema = export.schema(dataset, selected)
+    derived = export.derivers(db, dataset, selected, start_date, end_date, with_archive)
+
+    # 3. Stream on a dedicated connection to the same database, living as long as the response
+    bind = db.get_bind()
+
+    def body():
+        with bind.connect() as connection:
+            yield from export.stream(connection, query, names, arrow_schema, fmt, derived)
+
+    media_type, extension = export.FORMATS[fmt]
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{extension}"'},
+    )
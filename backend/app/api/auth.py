@@ -1,48 +1,90 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from ..db.session import get_db
+from ..db.session import get_shared_db
 from ..models import models
 from ..schemas import schemas
-from ..core.security import verify_password, create_access_token, get_password_hash
+from ..core.security import (
+    create_access_token,
+    get_password_hash_async,
+    verify_password_async,
+    HashingOverloaded,
+)
 from .deps import get_current_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many logins in progress, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+# These endpoints are async: the short database calls go to the threadpool while
+# the expensive hashing waits on the dedicated pool without holding a thread or
+# a pooled connection.
+
+def _find_credentials(db: Session, email: str):
+    user = db.query(models.User).filter(models.User.email == email).first()
+    found = (user.id, user.hashed_password, user.tenant_id) if user else None
+    db.rollback()  # Hand the connection back to the pool before hashing
+    return found
+
 @router.post("/login/access-token", response_model=schemas.Token)
-def login_access_token(
-    db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
+async def login_access_token(
+    db: Session = Depends(get_shared_db), form_data: OAuth2PasswordRequestForm = Depends()
 ):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    credentials = await run_in_threadpool(_find_credentials, db, form_data.username)
+    try:
+        verified, new_hash = (
+            await verify_password_async(form_data.password, credentials[1]) if credentials else (False, None)
+        )
+    except HashingOverloaded:
+        raise _overloaded()
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user_id, tenant_id = credentials[0], credentials[2]
+    if new_hash:
+        # Work factor changed since this password was stored: upgrade it transparently
+        def rehash():
+            db.query(models.User).filter(models.User.id == user_id).update({models.User.hashed_password: new_hash})
+            db.commit()
+        await run_in_threadpool(rehash)
     access_token_expires = timedelta(minutes=30)
     return {
-        "access_token": create_access_token(user.id, expires_delta=access_token_expires),
+        "access_token": create_access_token(user_id, expires_delta=access_token_expires, tenant_id=tenant_id),
         "token_type": "bearer",
     }
 
 @router.post("/register", response_model=schemas.UserOut)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
+async def register_user(user: schemas.UserCreate, db: Session = Depends(get_shared_db)):
+    if await run_in_threadpool(_find_credentials, db, user.email):
         raise HTTPException(
             status_code=400,
             detail="User with this email already exists"
         )
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except HashingOverloaded:
+        raise _overloaded()
     new_user = models.User(
         email=user.email,
-        hashed_password=get_password_hash(user.password),
+        hashed_password=hashed_password,
         role=user.role
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+
+    def save():
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+    await run_in_threadpool(save)
     return new_user
 
 @router.get("/me", response_model=schemas.UserOut)
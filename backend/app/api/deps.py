@@ -1,16 +1,48 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
-from ..db.session import get_db
+from typing import Optional
+from ..db.session import (
+    LAST_WRITE_COOKIE, LAST_WRITE_HEADER, engine, get_shared_db, ReadSessionLocal, read_engine, required_tenant, tenant_engine,
+)
 from ..models import models
 from ..schemas import schemas
-from ..core.security import SECRET_KEY, ALGORITHM
+from ..core.config import DEFAULT_TENANT_ID
+from ..core.security import SECRET_KEY, ALGORITHM, bearer_claims
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login/access-token")
 
+def token_subject(request: Request) -> Optional[str]:
+    """User id from the bearer token, or None. Only used for routing, never for auth."""
+    claims = bearer_claims(request.headers.get("Authorization", ""))
+    return claims.get("sub") if claims else None
+
+def client_last_write(request: Request) -> Optional[float]:
+    """Epoch time of the client's last write as it reports it, or None. Only used for routing."""
+    value = request.cookies.get(LAST_WRITE_COOKIE) or request.headers.get(LAST_WRITE_HEADER)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints, served by a replica when one is configured.
+
+    Replicas mirror the primary, so tenants with their own database read from it directly.
+    """
+    tenant_id = required_tenant(request)
+    bind = tenant_engine(tenant_id)
+    if bind is engine:
+        bind = read_engine(token_subject(request), client_last_write(request))
+    db = ReadSessionLocal(bind=bind, info={"tenant_id": tenant_id})
+    try:
+        yield db
+    finally:
+        db.close()
+
 def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+    db: Session = Depends(get_shared_db), token: str = Depends(oauth2_scheme)
 ) -> models.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -23,10 +55,12 @@ def get_current_user(
         if user_id is None:
             raise credentials_exception
         token_data = schemas.TokenData(id=int(user_id))
+        tenant_id = int(payload.get("tid", DEFAULT_TENANT_ID))
     except (JWTError, ValueError):
         raise credentials_exception
     user = db.query(models.User).filter(models.User.id == token_data.id).first()
-    if user is None:
+    # A user moved to another tenant must log in again
+    if user is None or user.tenant_id != tenant_id:
         raise credentials_exception
     return user
 
@@ -1,19 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import date
 from ..db.session import get_db
 from ..models import models
 from ..schemas import schemas
-from .deps import get_current_user, check_role
+from ..services import projection
+from ..services.projection import Fieldset
+from .fields import sparse_fields
+from .deps import get_current_user, check_role, get_read_db
 
 router = APIRouter(prefix="/drivers", tags=["drivers"])
 
 @router.get("/", response_model=List[schemas.DriverOut])
 def get_drivers(
-    db: Session = Depends(get_db),
+    fieldset: Optional[Fieldset] = Depends(sparse_fields(schemas.DriverOut)),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    if fieldset is not None:
+        return JSONResponse(projection.rows(db, models.Driver, fieldset))
     return db.query(models.Driver).all()
 
 @router.post("/", response_model=schemas.DriverOut)
@@ -28,16 +36,27 @@ def create_driver(
     
     new_driver = models.Driver(**driver.dict())
     db.add(new_driver)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent create in the same tenant
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Driver with this license number already exists")
     db.refresh(new_driver)
     return new_driver
 
 @router.get("/{driver_id}", response_model=schemas.DriverOut)
 def get_driver(
     driver_id: int,
-    db: Session = Depends(get_db),
+    fieldset: Optional[Fieldset] = Depends(sparse_fields(schemas.DriverOut)),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    if fieldset is not None:
+        found = projection.rows(db, models.Driver, fieldset, models.Driver.id == driver_id)
+        if not found:
+            raise HTTPException(status_code=404, detail="Driver not found")
+        return JSONResponse(found[0])
     driver = db.query(models.Driver).filter(models.Driver.id == driver_id).first()
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
@@ -0,0 +1,52 @@
+from fastapi import HTTPException, Query
+from typing import Optional
+from ..services.projection import Fieldset
+
+
+def _split(value: Optional[str]) -> list:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def _unique(names: list) -> list:
+    return list(dict.fromkeys(names))
+
+
+def sparse_fields(schema, **relations):
+    """Dependency for `?fields=` and `?include=` on endpoints returning `schema`.
+
+    Resolves to None when neither is given, so the endpoint keeps returning
+    the full model. Otherwise `fields` picks top-level fields (`driver.name`
+    narrows an embedded object) and `include` embeds whole related objects.
+    Keyword arguments map relation names to their schemas.
+    """
+    scalars = [name for name in schema.model_fields if name not in relations]
+
+    def dependency(
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,status,driver.name"),
+        include: Optional[str] = Query(None, description="Comma-separated related objects to embed"),
+    ) -> Optional[Fieldset]:
+        if fields is None and include is None:
+            return None
+        requested, included = _split(fields), _split(include)
+        unknown = [name for name in included if name not in relations]
+        columns = ["id"] + (scalars if fields is None else [])
+        nested = {name: [] for name in included if name in relations}
+        for name in requested:
+            relation, _, field = name.partition(".")
+            if field and relation in relations and field in relations[relation].model_fields:
+                nested.setdefault(relation, []).append(field)
+            elif not field and name in relations:
+                nested.setdefault(name, [])
+            elif not field and name in scalars:
+                columns.append(name)
+            else:
+                unknown.append(name)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return Fieldset(
+            _unique(columns),
+            # A relation named without specific fields comes back whole
+            {name: _unique(["id"] + (picked or list(relations[name].model_fields))) for name, picked in nested.items()},
+        )
+
+    return dependency
@@ -1,19 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date
+from ..db import group_commit
 from ..db.session import get_db
 from ..models import models
 from ..schemas import schemas
-from .deps import get_current_user, check_role
+from ..services import archive, jobs, post_trip
+from ..services.projection import Fieldset
+from .fields import sparse_fields
+from .deps import get_current_user, check_role, get_read_db
 
 router = APIRouter(prefix="/fuel", tags=["fuel"])
 
 @router.get("/", response_model=List[schemas.FuelLogOut])
 def get_fuel_logs(
-    db: Session = Depends(get_db),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    fieldset: Optional[Fieldset] = Depends(sparse_fields(schemas.FuelLogOut)),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    return db.query(models.FuelLog).all()
+    # Archived rows are only read when the requested range reaches back into them
+    if fieldset is not None:
+        return JSONResponse(archive.read(db, "fuel", start_date, end_date, fieldset))
+    return archive.read(db, "fuel", start_date, end_date)
 
 @router.post("/", response_model=schemas.FuelLogOut)
 def create_fuel_log(
@@ -21,17 +33,20 @@ def create_fuel_log(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # 1. Validate Vehicle
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == log.vehicle_id).first()
-    if not vehicle:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    
-    # 2. Create Log
-    new_log = models.FuelLog(**log.dict())
-    db.add(new_log)
-    db.commit()
-    db.refresh(new_log)
-    return new_log
+    def write(db: Session):
+        # 1. Validate Vehicle
+        vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == log.vehicle_id).first()
+        if not vehicle:
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+
+        # 2. Create Log
+        new_log = models.FuelLog(**log.dict())
+        db.add(new_log)
+        jobs.enqueue(db, post_trip.VEHICLE_ROLLUP, {"vehicle_id": log.vehicle_id})
+        db.flush()
+        return new_log
+
+    return group_commit.execute(db, write)
 
 @router.delete("/{log_id}")
 def delete_fuel_log(
@@ -39,11 +54,14 @@ def delete_fuel_log(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_role([models.UserRole.ADMIN, models.UserRole.MANAGER]))
 ):
-    log = db.query(models.FuelLog).filter(models.FuelLog.id == log_id).first()
-    if not log:
-        raise HTTPException(status_code=404, detail="Fuel log not found")
-    
-    db.delete(log)
-    db.commit()
-    return {"detail": "Fuel log deleted successfully"}
+    def write(db: Session):
+        log = db.query(models.FuelLog).filter(models.FuelLog.id == log_id).first()
+        if not log:
+            raise HTTPException(status_code=404, detail="Fuel log not found")
+
+        db.delete(log)
+        jobs.enqueue(db, post_trip.VEHICLE_ROLLUP, {"vehicle_id": log.vehicle_id})
+        return {"detail": "Fuel log deleted successfully"}
+
+    return group_commit.execute(db, write)
 
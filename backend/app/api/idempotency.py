@@ -0,0 +1,202 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import anyio
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from ..core.config import IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_PENDING_SECONDS, IDEMPOTENCY_TTL_HOURS
+from ..db.session import SessionLocal
+from ..models import models
+from .deps import token_subject
+
+# Create and complete endpoints are POST and PATCH. Login is left out: replaying
+# a token would outlive the password it was issued for.
+IDEMPOTENT_METHODS = ("POST", "PATCH")
+EXCLUDED_PATHS = ("/auth/login/access-token",)
+
+StoredResponse = Tuple[str, int, str, bytes]  # request hash, status, content type, body
+
+
+class ResponseCache:
+    """Per-worker LRU of finished responses, so a retry never touches the database.
+
+    Entries expire with their database record, IDEMPOTENCY_TTL_HOURS after the first request.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: "OrderedDict[str, Tuple[datetime, StoredResponse]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, scope: str) -> Optional[StoredResponse]:
+        with self.lock:
+            found = self.entries.get(scope)
+            if found is None:
+                return None
+            expires_at, entry = found
+            if expires_at <= datetime.utcnow():
+                del self.entries[scope]
+                return None
+            self.entries.move_to_end(scope)
+            return entry
+
+    def put(self, scope: str, entry: StoredResponse, created_at: datetime):
+        with self.lock:
+            self.entries[scope] = (created_at + timedelta(hours=IDEMPOTENCY_TTL_HOURS), entry)
+            self.entries.move_to_end(scope)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+cache = ResponseCache(IDEMPOTENCY_CACHE_SIZE)
+
+
+def _claim(scope: str, request_hash: str):
+    """Reserve `scope` for this request, or return what an earlier request left.
+
+    Returns ("new", None, None), ("pending", None, None) or ("done", StoredResponse, created_at).
+    """
+    db = SessionLocal()
+    try:
+        record = db.query(models.IdempotencyRecord).filter(models.IdempotencyRecord.scope == scope).first()
+        if record and record.created_at < datetime.utcnow() - timedelta(hours=IDEMPOTENCY_TTL_HOURS):
+            db.delete(record)
+            db.commit()
+            record = None
+        if record is None:
+            db.add(models.IdempotencyRecord(scope=scope, request_hash=request_hash))
+            try:
+                db.commit()
+                return "new", None, None
+            except IntegrityError:
+                # Another worker claimed the key between our read and insert
+                db.rollback()
+                record = db.query(models.IdempotencyRecord).filter(models.IdempotencyRecord.scope == scope).first()
+        if record.status_code is None:
+            if record.created_at >= datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_PENDING_SECONDS):
+                return "pending", None, None
+            # The worker running it died before finishing or releasing; take the key
+            # over, unless another retry just did
+            taken = db.query(models.IdempotencyRecord).filter(
+                models.IdempotencyRecord.scope == scope,
+                models.IdempotencyRecord.status_code.is_(None),
+                models.IdempotencyRecord.created_at == record.created_at,
+            ).update({"request_hash": request_hash, "created_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            return ("new" if taken else "pending"), None, None
+        return "done", (record.request_hash, record.status_code, record.content_type, record.body), record.created_at
+    finally:
+        db.close()
+
+
+def _finish(scope: str, status_code: int, content_type: str, body: bytes):
+    db = SessionLocal()
+    try:
+        db.query(models.IdempotencyRecord).filter(models.IdempotencyRecord.scope == scope).update(
+            {"status_code": status_code, "content_type": content_type, "body": body}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _release(scope: str):
+    db = SessionLocal()
+    try:
+        db.query(models.IdempotencyRecord).filter(models.IdempotencyRecord.scope == scope).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _replay(entry: StoredResponse, request_hash: str) -> Response:
+    stored_hash, status_code, content_type, body = entry
+    if stored_hash != request_hash:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": "Idempotency-Key was already used with a different request"},
+        )
+    return Response(content=body, status_code=status_code, media_type=content_type, headers={"Idempotent-Replayed": "true"})
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response for a repeated `Idempotency-Key` instead of running the endpoint again."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENT_METHODS or scope["path"] in EXCLUDED_PATHS:
+            return await self.app(scope, receive, send)
+        key = Headers(scope=scope).get("idempotency-key")
+        if not key:
+            return await self.app(scope, receive, send)
+        if len(key) > 255:
+            return await JSONResponse(status_code=400, content={"detail": "Idempotency-Key is too long"})(scope, receive, send)
+
+        # 1. Read the body once so it can be fingerprinted (with the query string) and handed on
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        request_hash = hashlib.sha256(scope.get("query_string", b"") + b"\n" + body).hexdigest()
+        user_key = token_subject(Request(scope)) or "anonymous"
+        record_scope = f"{user_key}:{scope['method']}:{scope['path']}:{key}"
+
+        # 2. Replay from memory, then from the database
+        entry = cache.get(record_scope)
+        if entry is None:
+            state, entry, created_at = await run_in_threadpool(_claim, record_scope, request_hash)
+            if state == "pending":
+                return await JSONResponse(
+                    status_code=409,
+                    content={"detail": "A request with this Idempotency-Key is still in progress"},
+                )(scope, receive, send)
+            if state == "done":
+                cache.put(record_scope, entry, created_at)
+        if entry is not None:
+            return await _replay(entry, request_hash)(scope, receive, send)
+
+        # 3. First time: run the endpoint and keep its response
+        started_at = datetime.utcnow()  # close enough to the record's created_at
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": 500, "content_type": "application/json", "body": []}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["content_type"] = Headers(raw=message["headers"]).get("content-type", "application/json")
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            # Cancellation too (client gone, shutdown), shielded so the release itself runs
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(_release, record_scope)
+            raise
+        if response["status"] >= 500:
+            # Nothing was committed, so let the client try again with the same key
+            await run_in_threadpool(_release, record_scope)
+            return
+        stored = (request_hash, response["status"], response["content_type"], b"".join(response["body"]))
+        await run_in_threadpool(_finish, record_scope, *stored[1:])
+        cache.put(record_scope, stored, started_at)
@@ -1,20 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import date
+from ..db import group_commit
 from ..db.session import get_db
 from ..models import models
 from ..schemas import schemas
-from .deps import get_current_user, check_role
+from ..services import archive, jobs, post_trip
+from ..services.projection import Fieldset
+from .fields import sparse_fields
+from .deps import get_current_user, check_role, get_read_db
 
 router = APIRouter(prefix="/maintenance", tags=["maintenance"])
 
 @router.get("/", response_model=List[schemas.MaintenanceLogOut])
 def get_maintenance_logs(
-    db: Session = Depends(get_db),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    fieldset: Optional[Fieldset] = Depends(sparse_fields(schemas.MaintenanceLogOut)),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    return db.query(models.MaintenanceLog).all()
+    # Archived rows are only read when the requested range reaches back into them
+    if fieldset is not None:
+        return JSONResponse(archive.read(db, "maintenance", start_date, end_date, fieldset))
+    return archive.read(db, "maintenance", start_date, end_date)
 
 @router.post("/", response_model=schemas.MaintenanceLogOut)
 def create_maintenance_log(
@@ -22,20 +33,23 @@ def create_maintenance_log(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_role([models.UserRole.ADMIN, models.UserRole.MANAGER]))
 ):
-    # 1. Validate Vehicle
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == log.vehicle_id).first()
-    if not vehicle:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    
-    # 2. Update Vehicle Status
-    vehicle.status = models.VehicleStatus.IN_SHOP
-    
-    # 3. Create Log
-    new_log = models.MaintenanceLog(**log.dict())
-    db.add(new_log)
-    db.commit()
-    db.refresh(new_log)
-    return new_log
+    def write(db: Session):
+        # 1. Validate Vehicle
+        vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == log.vehicle_id).first()
+        if not vehicle:
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+
+        # 2. Update Vehicle Status
+        vehicle.status = models.VehicleStatus.IN_SHOP
+
+        # 3. Create Log
+        new_log = models.MaintenanceLog(**log.dict())
+        db.add(new_log)
+        jobs.enqueue(db, post_trip.VEHICLE_ROLLUP, {"vehicle_id": log.vehicle_id})
+        db.flush()
+        return new_log
+
+    return group_commit.execute(db, write)
 
 @router.patch("/{log_id}/complete", response_model=schemas.MaintenanceLogOut)
 def complete_maintenance_log(
@@ -43,18 +57,18 @@ def complete_maintenance_log(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_role([models.UserRole.ADMIN, models.UserRole.MANAGER]))
 ):
-    log = db.query(models.MaintenanceLog).filter(models.MaintenanceLog.id == log_id).first()
-    if not log:
-        raise HTTPException(status_code=404, detail="Maintenance log not found")
-    
-    # Update Vehicle Status
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == log.vehicle_id).first()
-    if vehicle:
-        vehicle.status = models.VehicleStatus.AVAILABLE
-    
-    db.commit()
-    db.refresh(log)
-    return log
+    def write(db: Session):
+        log = db.query(models.MaintenanceLog).filter(models.MaintenanceLog.id == log_id).first()
+        if not log:
+            raise HTTPException(status_code=404, detail="Maintenance log not found")
+
+        # Update Vehicle Status
+        vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == log.vehicle_id).first()
+        if vehicle:
+            vehicle.status = models.VehicleStatus.AVAILABLE
+        return log
+
+    return group_commit.execute(db, write)
 
 @router.delete("/{log_id}")
 def delete_maintenance_log(
@@ -62,15 +76,18 @@ def delete_maintenance_log(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_role([models.UserRole.ADMIN, models.UserRole.MANAGER]))
 ):
-    log = db.query(models.MaintenanceLog).filter(models.MaintenanceLog.id == log_id).first()
-    if not log:
-        raise HTTPException(status_code=404, detail="Maintenance log not found")
-    
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == log.vehicle_id).first()
-    if vehicle and vehicle.status == models.VehicleStatus.IN_SHOP:
-        vehicle.status = models.VehicleStatus.AVAILABLE
-        
-    db.delete(log)
-    db.commit()
-    return {"detail": "Maintenance log deleted successfully"}
+    def write(db: Session):
+        log = db.query(models.MaintenanceLog).filter(models.MaintenanceLog.id == log_id).first()
+        if not log:
+            raise HTTPException(status_code=404, detail="Maintenance log not found")
+
+        vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == log.vehicle_id).first()
+        if vehicle and vehicle.status == models.VehicleStatus.IN_SHOP:
+            vehicle.status = models.VehicleStatus.AVAILABLE
+
+        db.delete(log)
+        jobs.enqueue(db, post_trip.VEHICLE_ROLLUP, {"vehicle_id": log.vehicle_id})
+        return {"detail": "Maintenance log deleted successfully"}
+
+    return group_commit.execute(db, write)
 
@@ -0,0 +1,227 @@
+import logging
+import math
+import re
+import time
+from typing import Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from ..core.config import RATE_LIMIT_MAX_INFLIGHT, RATE_LIMIT_REDIS_URL, RATE_LIMIT_SCALE
+from ..db.session import SessionLocal
+from ..models import models
+from .deps import token_subject
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency, only needed to share buckets between workers
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+Role = models.UserRole
+
+# role -> route class -> (tokens per second, burst)
+BUDGETS: Dict[Role, Dict[str, Tuple[float, float]]] = {
+    Role.ADMIN:      {"dispatch": (10, 30), "writes": (10, 30), "reads": (20, 60), "stats": (5, 20)},
+    Role.MANAGER:    {"dispatch": (10, 30), "writes": (10, 30), "reads": (20, 60), "stats": (5, 20)},
+    Role.DISPATCHER: {"dispatch": (10, 30), "writes": (5, 20),  "reads": (20, 60), "stats": (2, 10)},
+    Role.DRIVER:     {"dispatch": (2, 5),   "writes": (2, 10),  "reads": (5, 20),  "stats": (1, 5)},
+    Role.ANALYST:    {"dispatch": (1, 2),   "writes": (1, 5),   "reads": (10, 30), "stats": (10, 30)},
+}
+
+# Creating and completing trips is what the rest of the fleet waits on
+DISPATCH_ROUTES = (
+    ("POST", re.compile(r"^/trips/?$")),
+    ("PATCH", re.compile(r"^/trips/\d+/complete/?$")),
+)
+STATS_PREFIXES = ("/stats", "/analytics")
+EXEMPT_PREFIXES = ("/auth", "/health", "/docs", "/redoc", "/openapi.json")
+
+ROLE_CACHE_SECONDS = 60
+MAX_TRACKED = 10000
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if method == "OPTIONS" or path == "/" or path.startswith(EXEMPT_PREFIXES):
+        return None
+    for route_method, pattern in DISPATCH_ROUTES:
+        if method == route_method and pattern.match(path):
+            return "dispatch"
+    if path.startswith(STATS_PREFIXES):
+        return "stats"
+    return "reads" if method in ("GET", "HEAD") else "writes"
+
+
+class LocalBuckets:
+    """Token buckets for this worker. Only touched from the event loop, so no locking."""
+
+    name = "local"
+
+    def __init__(self):
+        self.buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, last refill)
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """Spend one token. Returns 0 when allowed, else seconds until a token is back."""
+        now = time.monotonic()
+        if len(self.buckets) > MAX_TRACKED:
+            # Forget buckets that have refilled completely; they'd start full anyway
+            self.buckets = {k: v for k, v in self.buckets.items() if now - v[1] < burst / rate}
+        tokens, last = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        if tokens >= 1:
+            self.buckets[key] = (tokens - 1, now)
+            return 0.0
+        self.buckets[key] = (tokens, now)
+        return (1 - tokens) / rate
+
+
+# Same bucket as LocalBuckets, kept in a Redis hash and refilled against the server clock
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local last = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Buckets shared by every worker pointed at the same Redis."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        self.client = aioredis.from_url(url)
+        self.script = self.client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        return float(await self.script(keys=[f"fleetnova:ratelimit:{key}"], args=[rate, burst]))
+
+
+class Metrics:
+    def __init__(self):
+        self.counters: Dict[Tuple[str, str], list] = {}  # (role, route class) -> [allowed, limited]
+        self.shed = 0
+        self.backend_errors = 0
+
+    def count(self, role: Role, klass: str, allowed: bool):
+        counter = self.counters.setdefault((role.value, klass), [0, 0])
+        counter[0 if allowed else 1] += 1
+
+
+local_buckets = LocalBuckets()
+shared_buckets = RedisBuckets(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL and aioredis else None
+if RATE_LIMIT_REDIS_URL and aioredis is None:
+    logger.warning("FLEETNOVA_RATE_LIMIT_REDIS_URL is set but redis is not installed; using per-worker buckets")
+metrics = Metrics()
+inflight = 0
+_roles: Dict[str, Tuple[Optional[Role], float]] = {}
+
+
+def _load_role(user_id: str) -> Optional[Role]:
+    db = SessionLocal()
+    try:
+        row = db.query(models.User.role).filter(models.User.id == int(user_id)).first()
+        return row.role if row else None
+    except ValueError:
+        return None
+    finally:
+        db.close()
+
+
+async def _role(user_id: str) -> Optional[Role]:
+    now = time.monotonic()
+    cached = _roles.get(user_id)
+    if cached and cached[1] > now:
+        return cached[0]
+    role = await run_in_threadpool(_load_role, user_id)
+    if len(_roles) > MAX_TRACKED:
+        _roles.clear()
+    _roles[user_id] = (role, now + ROLE_CACHE_SECONDS)
+    return role
+
+
+async def _take(key: str, rate: float, burst: float) -> float:
+    if shared_buckets is not None:
+        try:
+            return await shared_buckets.take(key, rate, burst)
+        except Exception:
+            # Keep limiting per worker rather than failing every request
+            metrics.backend_errors += 1
+            logger.exception("Shared rate limit backend failed")
+    return await local_buckets.take(key, rate, burst)
+
+
+def _too_many(detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def snapshot() -> dict:
+    return {
+        "backend": shared_buckets.name if shared_buckets is not None else local_buckets.name,
+        "inflight": inflight,
+        "max_inflight": RATE_LIMIT_MAX_INFLIGHT,
+        "shed": metrics.shed,
+        "backend_errors": metrics.backend_errors,
+        "buckets": [
+            {"role": role, "route_class": klass, "allowed": allowed, "limited": limited}
+            for (role, klass), (allowed, limited) in sorted(metrics.counters.items())
+        ],
+    }
+
+
+class RateLimitMiddleware:
+    """Per-user token buckets, checked before a request takes a thread or a database connection.
+
+    Users are keyed on the id in their bearer token (the one get_current_user
+    resolves), with a budget per role and route class. Requests without a
+    valid token pass through and are turned away by the endpoint itself.
+    Everything except dispatch also shares a per-worker in-flight cap, so a
+    flood of reads can't take every threadpool slot from trip dispatch.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global inflight
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        klass = route_class(scope["method"], scope["path"])
+        user_id = token_subject(Request(scope)) if klass else None
+        role = await _role(user_id) if user_id else None
+        if role is None:
+            return await self.app(scope, receive, send)
+
+        rate, burst = BUDGETS[role][klass]
+        wait = await _take(f"{user_id}:{klass}", rate * RATE_LIMIT_SCALE, burst * RATE_LIMIT_SCALE)
+        metrics.count(role, klass, wait == 0)
+        if wait:
+            return await _too_many("Rate limit exceeded", wait)(scope, receive, send)
+
+        if klass == "dispatch":
+            return await self.app(scope, receive, send)
+        if inflight >= RATE_LIMIT_MAX_INFLIGHT:
+            metrics.shed += 1
+            return await _too_many("Server is busy, try again shortly", 1)(scope, receive, send)
+        inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            inflight -= 1
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..models import models
+from ..schemas import schemas
+from ..services import search as search_index
+from .deps import get_current_user, get_read_db
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("/", response_model=schemas.SearchResults)
+def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    kind: Optional[str] = Query(None, pattern="^(vehicles|drivers)$"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Vehicles by name or plate, drivers by name or license number, best match first
+    kinds = [kind] if kind else list(search_index.SOURCES)
+    return search_index.search(db, q.strip(), kinds, limit)
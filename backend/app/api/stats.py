@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends
+from typing import List
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from ..db.session import get_db
 from ..models import models
-from .deps import get_current_user
+from ..schemas import schemas
+from . import ratelimit
+from .deps import get_current_user, check_role, get_read_db
 
 router = APIRouter(prefix="/stats", tags=["stats"])
 
 @router.get("/dashboard-kpis")
 def get_dashboard_kpis(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
     total_vehicles = db.query(models.Vehicle).count()
@@ -32,7 +34,7 @@ def get_dashboard_kpis(
 
 @router.get("/analytics-data")
 def get_analytics_data(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Sector density could be count of vehicles by type
@@ -55,3 +57,18 @@ def get_analytics_data(
         "efficiencyData": efficiency_data
     }
 
+@router.get("/vehicle-costs", response_model=List[schemas.VehicleRollupOut])
+def get_vehicle_costs(
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Maintained by background post-trip processing, so this is a plain read;
+    # the join keeps it to the caller's tenant
+    return db.query(models.VehicleRollup).join(models.Vehicle, models.Vehicle.id == models.VehicleRollup.vehicle_id).all()
+
+@router.get("/rate-limits", response_model=schemas.RateLimitMetrics)
+def get_rate_limits(
+    current_user: models.User = Depends(check_role([models.UserRole.ADMIN, models.UserRole.MANAGER]))
+):
+    # Counters are per worker process
+    return ratelimit.snapshot()
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+from ..core.config import TELEMETRY_MAX_BATCH
+from ..db.session import get_db
+from ..models import models
+from ..schemas import schemas
+from ..services import telemetry
+from .deps import get_current_user, check_role, get_read_db
+
+router = APIRouter(prefix="/telemetry", tags=["telemetry"])
+
+@router.post("/ingest", response_model=schemas.TelemetryIngestResult)
+async def ingest_telemetry(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(check_role([models.UserRole.ADMIN, models.UserRole.MANAGER, models.UserRole.DISPATCHER, models.UserRole.DRIVER]))
+):
+    # Body is NDJSON (one point per line) or packed binary records, see services/telemetry.py
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+    try:
+        batch = telemetry.parse(body, content_type)
+    except LookupError:
+        raise HTTPException(status_code=415, detail="Send application/x-ndjson or application/octet-stream")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if len(batch["ts"]) > TELEMETRY_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {TELEMETRY_MAX_BATCH} points per request")
+
+    accepted, rejected = await run_in_threadpool(telemetry.ingest, db, batch)
+    return {"accepted": accepted, "rejected": rejected}
+
+@router.get("/{vehicle_id}", response_model=List[schemas.TelemetryBucketOut])
+def get_telemetry(
+    vehicle_id: int,
+    resolution: str = Query("hour", pattern="^(minute|hour|day)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Rollups are keyed by vehicle only; the vehicle lookup is tenant-scoped
+    if db.query(models.Vehicle.id).filter(models.Vehicle.id == vehicle_id).first() is None:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    return telemetry.buckets(db, vehicle_id, resolution, start, end)
@@ -1,20 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime, date
+from ..db import group_commit
 from ..db.session import get_db
 from ..models import models
 from ..schemas import schemas
-from .deps import get_current_user, check_role
+from ..services import archive, distance, jobs, post_trip
+from ..services.projection import Fieldset
+from .fields import sparse_fields
+from .deps import get_current_user, check_role, get_read_db
 
 router = APIRouter(prefix="/trips", tags=["trips"])
 
 @router.get("/", response_model=List[schemas.TripOut])
 def get_trips(
-    db: Session = Depends(get_db),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    fieldset: Optional[Fieldset] = Depends(sparse_fields(schemas.TripOut, driver=schemas.DriverOut, vehicle=schemas.VehicleOut)),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    return db.query(models.Trip).all()
+    # Archived rows are only read when the requested range reaches back into them
+    if fieldset is not None:
+        return JSONResponse(archive.read(db, "trips", start_date, end_date, fieldset))
+    return distance.annotate_trips(db, archive.read(db, "trips", start_date, end_date))
 
 @router.post("/", response_model=schemas.TripOut)
 def create_trip(
@@ -22,70 +33,80 @@ def create_trip(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_role([models.UserRole.ADMIN, models.UserRole.MANAGER, models.UserRole.DISPATCHER]))
 ):
-    # 1. Validate Vehicle
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == trip.vehicle_id).first()
-    if not vehicle:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    if vehicle.status != models.VehicleStatus.AVAILABLE:
-        raise HTTPException(status_code=400, detail=f"Vehicle is currently {vehicle.status}")
-    
-    # 2. Validate Driver
-    driver = db.query(models.Driver).filter(models.Driver.id == trip.driver_id).first()
-    if not driver:
-        raise HTTPException(status_code=404, detail="Driver not found")
-    if driver.status != models.DriverStatus.ON_DUTY:
-        raise HTTPException(status_code=400, detail=f"Driver level status is {driver.status}")
-    if driver.license_expiry < date.today():
-        raise HTTPException(status_code=400, detail="Driver license has expired")
-    
-    # 3. Validate Capacity
-    if trip.cargo_weight > vehicle.capacity:
-        raise HTTPException(status_code=400, detail=f"Load ({trip.cargo_weight}kg) exceeds vehicle capacity ({vehicle.capacity}kg)")
-
-    # 4. Create Trip
-    new_trip = models.Trip(
-        **trip.dict(),
-        status=models.TripStatus.DISPATCHED # Auto-dispatch for now as per "Successful Dispatch" workflow
-    )
-    
-    # 5. Update Statuses
-    vehicle.status = models.VehicleStatus.ON_TRIP
-    driver.status = models.DriverStatus.ON_TRIP
-    
-    db.add(new_trip)
-    db.commit()
-    db.refresh(new_trip)
-    return new_trip
+    def write(db: Session):
+        # 1. Validate Vehicle
+        vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == trip.vehicle_id).first()
+        if not vehicle:
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+        if vehicle.status != models.VehicleStatus.AVAILABLE:
+            raise HTTPException(status_code=400, detail=f"Vehicle is currently {vehicle.status}")
+
+        # 2. Validate Driver
+        driver = db.query(models.Driver).filter(models.Driver.id == trip.driver_id).first()
+        if not driver:
+            raise HTTPException(status_code=404, detail="Driver not found")
+        if driver.status != models.DriverStatus.ON_DUTY:
+            raise HTTPException(status_code=400, detail=f"Driver level status is {driver.status}")
+        if driver.license_expiry < date.today():
+            raise HTTPException(status_code=400, detail="Driver license has expired")
+
+        # 3. Validate Capacity
+        if trip.cargo_weight > vehicle.capacity:
+            raise HTTPException(status_code=400, detail=f"Load ({trip.cargo_weight}kg) exceeds vehicle capacity ({vehicle.capacity}kg)")
+
+        # 4. Create Trip
+        new_trip = models.Trip(
+            **trip.dict(),
+            status=models.TripStatus.DISPATCHED, # Auto-dispatch for now as per "Successful Dispatch" workflow
+            start_odometer=vehicle.odometer
+        )
+
+        # 5. Update Statuses
+        vehicle.status = models.VehicleStatus.ON_TRIP
+        driver.status = models.DriverStatus.ON_TRIP
+
+        db.add(new_trip)
+        db.flush()
+        new_trip.vehicle, new_trip.driver = vehicle, driver
+        return new_trip
+
+    return distance.annotate_trips(db, [group_commit.execute(db, write)])[0]
 
 @router.patch("/{trip_id}/complete", response_model=schemas.TripOut)
 def complete_trip(
     trip_id: int,
-    final_odometer: float,
+    final_odometer: Optional[float] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
-    if not trip:
-        raise HTTPException(status_code=404, detail="Trip not found")
-    if trip.status != models.TripStatus.DISPATCHED:
-        raise HTTPException(status_code=400, detail="Only dispatched trips can be completed")
-
-    # Update Trip
-    trip.status = models.TripStatus.COMPLETED
-    trip.completed_at = datetime.utcnow()
-    
-    # Update Vehicle
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == trip.vehicle_id).first()
-    vehicle.status = models.VehicleStatus.AVAILABLE
-    vehicle.odometer = final_odometer
-    
-    # Update Driver
-    driver = db.query(models.Driver).filter(models.Driver.id == trip.driver_id).first()
-    driver.status = models.DriverStatus.ON_DUTY # Returns to available pool
-    
-    db.commit()
-    db.refresh(trip)
-    return trip
+    def write(db: Session):
+        trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
+        if not trip:
+            raise HTTPException(status_code=404, detail="Trip not found")
+        if trip.status != models.TripStatus.DISPATCHED:
+            raise HTTPException(status_code=400, detail="Only dispatched trips can be completed")
+
+        vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == trip.vehicle_id).first()
+
+        # Update Trip; without a reading, take the odometer telemetry last reported
+        trip.status = models.TripStatus.COMPLETED
+        trip.completed_at = datetime.utcnow()
+        trip.final_odometer = final_odometer if final_odometer is not None else vehicle.odometer
+
+        # Update Vehicle
+        vehicle.status = models.VehicleStatus.AVAILABLE
+
+        # Update Driver
+        driver = db.query(models.Driver).filter(models.Driver.id == trip.driver_id).first()
+        driver.status = models.DriverStatus.ON_DUTY # Returns to available pool
+
+        # Odometer validation, rollups and safety scores run in the background
+        jobs.enqueue(db, post_trip.TRIP_COMPLETED, {"trip_id": trip.id})
+        db.flush()
+        trip.vehicle, trip.driver = vehicle, driver
+        return trip
+
+    return distance.annotate_trips(db, [group_commit.execute(db, write)])[0]
 
 @router.delete("/{trip_id}")
 def delete_trip(
@@ -93,18 +114,22 @@ def delete_trip(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_role([models.UserRole.ADMIN, models.UserRole.MANAGER, models.UserRole.DISPATCHER]))
 ):
-    trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
-    if not trip:
-        raise HTTPException(status_code=404, detail="Trip not found")
-    
-    if trip.status == models.TripStatus.DISPATCHED:
-        vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == trip.vehicle_id).first()
-        driver = db.query(models.Driver).filter(models.Driver.id == trip.driver_id).first()
-        if vehicle: vehicle.status = models.VehicleStatus.AVAILABLE
-        if driver: driver.status = models.DriverStatus.ON_DUTY
-        
-    db.delete(trip)
-    db.commit()
-    return {"detail": "Trip deleted successfully"}
+    def write(db: Session):
+        trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
+        if not trip:
+            raise HTTPException(status_code=404, detail="Trip not found")
+
+        if trip.status == models.TripStatus.DISPATCHED:
+            vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == trip.vehicle_id).first()
+            driver = db.query(models.Driver).filter(models.Driver.id == trip.driver_id).first()
+            if vehicle: vehicle.status = models.VehicleStatus.AVAILABLE
+            if driver: driver.status = models.DriverStatus.ON_DUTY
+
+        # Rollups and the driver's score no longer include it
+        jobs.enqueue(db, post_trip.TRIP_DELETED, {"vehicle_id": trip.vehicle_id, "driver_id": trip.driver_id})
+        db.delete(trip)
+        return {"detail": "Trip deleted successfully"}
+
+    return group_commit.execute(db, write)
 
 
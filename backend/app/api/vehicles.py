@@ -1,18 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..db.session import get_db
 from ..models import models
 from ..schemas import schemas
-from .deps import get_current_user, check_role
+from ..services import projection
+from ..services.projection import Fieldset
+from .fields import sparse_fields
+from .deps import get_current_user, check_role, get_read_db
 
 router = APIRouter(prefix="/vehicles", tags=["vehicles"])
 
 @router.get("/", response_model=List[schemas.VehicleOut])
 def get_vehicles(
-    db: Session = Depends(get_db),
+    fieldset: Optional[Fieldset] = Depends(sparse_fields(schemas.VehicleOut)),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    if fieldset is not None:
+        return JSONResponse(projection.rows(db, models.Vehicle, fieldset))
     return db.query(models.Vehicle).all()
 
 @router.post("/", response_model=schemas.VehicleOut)
@@ -27,16 +35,27 @@ def create_vehicle(
     
     new_vehicle = models.Vehicle(**vehicle.dict())
     db.add(new_vehicle)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent create in the same tenant
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Vehicle with this plate already exists")
     db.refresh(new_vehicle)
     return new_vehicle
 
 @router.get("/{vehicle_id}", response_model=schemas.VehicleOut)
 def get_vehicle(
     vehicle_id: int,
-    db: Session = Depends(get_db),
+    fieldset: Optional[Fieldset] = Depends(sparse_fields(schemas.VehicleOut)),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    if fieldset is not None:
+        found = projection.rows(db, models.Vehicle, fieldset, models.Vehicle.id == vehicle_id)
+        if not found:
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+        return JSONResponse(found[0])
     vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == vehicle_id).first()
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
@@ -0,0 +1,68 @@
+import os
+
+# Configuration (override through environment variables)
+
+# Hot/cold tiering: finished trips and logs older than this move to the archive tables
+ARCHIVE_AFTER_DAYS = int(os.getenv("FLEETNOVA_ARCHIVE_AFTER_DAYS", "180"))
+
+# Analytics exports: rows fetched from the cursor per Arrow record batch
+EXPORT_BATCH_ROWS = int(os.getenv("FLEETNOVA_EXPORT_BATCH_ROWS", "65536"))
+
+# Read replicas: comma separated database URLs that serve read-only endpoints
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("FLEETNOVA_READ_REPLICA_URLS", "").split(",") if url.strip()]
+# After a write, that user's reads stay on the primary for this many seconds
+READ_YOUR_WRITES_SECONDS = float(os.getenv("FLEETNOVA_READ_YOUR_WRITES_SECONDS", "5"))
+
+# Password hashing: pbkdf2 work factor (existing hashes are upgraded on the next login),
+# dedicated hashing threads, and how many requests may wait for one before login answers 503
+PASSWORD_HASH_ROUNDS = int(os.getenv("FLEETNOVA_PASSWORD_HASH_ROUNDS", "29000"))
+PASSWORD_HASH_WORKERS = int(os.getenv("FLEETNOVA_PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.getenv("FLEETNOVA_PASSWORD_HASH_QUEUE", "64"))
+
+# Idempotency-Key replay: responses kept in memory per worker, how long keys stay
+# valid, and after how long a request that never finished gives its key up
+# (keep it above the slowest endpoint)
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("FLEETNOVA_IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("FLEETNOVA_IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_PENDING_SECONDS = int(os.getenv("FLEETNOVA_IDEMPOTENCY_PENDING_SECONDS", "60"))
+
+# Background jobs: worker threads started with the app, jobs claimed per batch,
+# attempts before a job is marked failed, and how long a claimed job may run
+JOB_WORKERS = int(os.getenv("FLEETNOVA_JOB_WORKERS", "1"))
+JOB_BATCH_SIZE = int(os.getenv("FLEETNOVA_JOB_BATCH_SIZE", "100"))
+JOB_MAX_ATTEMPTS = int(os.getenv("FLEETNOVA_JOB_MAX_ATTEMPTS", "5"))
+JOB_POLL_SECONDS = float(os.getenv("FLEETNOVA_JOB_POLL_SECONDS", "1"))
+JOB_LEASE_SECONDS = int(os.getenv("FLEETNOVA_JOB_LEASE_SECONDS", "300"))
+JOB_RETENTION_HOURS = int(os.getenv("FLEETNOVA_JOB_RETENTION_HOURS", "72"))
+
+# Route distances: straight-line distance times this factor approximates road distance,
+# and ETAs assume this average speed
+ROUTE_DETOUR_FACTOR = float(os.getenv("FLEETNOVA_ROUTE_DETOUR_FACTOR", "1.2"))
+AVERAGE_SPEED_KMH = float(os.getenv("FLEETNOVA_AVERAGE_SPEED_KMH", "60"))
+
+# Group commit (SQLite): one writer thread applies queued writes in a shared transaction,
+# waiting up to GROUP_COMMIT_WINDOW_MS for more writes to join a batch
+GROUP_COMMIT = os.getenv("FLEETNOVA_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("FLEETNOVA_GROUP_COMMIT_WINDOW_MS", "2"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("FLEETNOVA_GROUP_COMMIT_MAX_BATCH", "256"))
+
+# Rate limiting: per-user token buckets (budgets per role and route class live in
+# app/api/ratelimit.py, scaled by RATE_LIMIT_SCALE), how many non-dispatch requests may
+# run at once per worker, and an optional Redis URL to share buckets between workers
+RATE_LIMIT = os.getenv("FLEETNOVA_RATE_LIMIT", "1") == "1"
+RATE_LIMIT_SCALE = float(os.getenv("FLEETNOVA_RATE_LIMIT_SCALE", "1"))
+RATE_LIMIT_MAX_INFLIGHT = int(os.getenv("FLEETNOVA_RATE_LIMIT_MAX_INFLIGHT", "32"))
+RATE_LIMIT_REDIS_URL = os.getenv("FLEETNOVA_RATE_LIMIT_REDIS_URL", "")
+
+# Telemetry: points accepted per request, and how long raw points, minute and hour
+# rollups are kept (day rollups are kept forever)
+TELEMETRY_MAX_BATCH = int(os.getenv("FLEETNOVA_TELEMETRY_MAX_BATCH", "50000"))
+TELEMETRY_RAW_RETENTION_DAYS = int(os.getenv("FLEETNOVA_TELEMETRY_RAW_RETENTION_DAYS", "7"))
+TELEMETRY_MINUTE_RETENTION_DAYS = int(os.getenv("FLEETNOVA_TELEMETRY_MINUTE_RETENTION_DAYS", "30"))
+TELEMETRY_HOUR_RETENTION_DAYS = int(os.getenv("FLEETNOVA_TELEMETRY_HOUR_RETENTION_DAYS", "365"))
+
+# Tenants: rows without a tenant belong to DEFAULT_TENANT_ID, how long a worker trusts its
+# cached tenant -> database routing, and where `tenants.py move` puts per-tenant SQLite files
+DEFAULT_TENANT_ID = 1
+TENANT_CACHE_SECONDS = int(os.getenv("FLEETNOVA_TENANT_CACHE_SECONDS", "60"))
+TENANT_DATABASE_DIR = os.getenv("FLEETNOVA_TENANT_DATABASE_DIR", "./tenants")
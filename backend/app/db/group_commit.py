@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional, TypeVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from ..core.config import GROUP_COMMIT, GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_WINDOW_MS
+from .session import SQLALCHEMY_DATABASE_URL, engine as primary_engine
+
+T = TypeVar("T")
+
+# A write operation: does its queries and changes on the session it is given,
+# flushes, and returns the endpoint's result. It must not commit. With group
+# commit on, results leave the writer detached, so an operation has to load
+# every attribute and relationship the response needs before it returns.
+WriteOp = Callable[[Session], T]
+
+
+class GroupCommitWriter:
+    """Single writer thread that applies queued operations in one transaction per batch.
+
+    Every operation runs inside its own SAVEPOINT, so one that raises (an
+    HTTPException from validation, say) is rolled back alone. Callers are
+    resolved only after the shared COMMIT, so durability matches a commit
+    per request while SQLite pays for one fsync per batch.
+    """
+
+    def __init__(self, url: str = SQLALCHEMY_DATABASE_URL, window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.engine = create_engine(url, connect_args={"check_same_thread": False})
+        if self.engine.dialect.name == "sqlite":
+            # pysqlite's own transaction handling breaks SAVEPOINT; take it over
+            # and grab the write lock up front
+            @event.listens_for(self.engine, "connect")
+            def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+                dbapi_connection.isolation_level = None
+
+            @event.listens_for(self.engine, "begin")
+            def _begin_immediate(connection):
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+        self.session_factory = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.pending: "queue.Queue" = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        self.last_batch = 0
+
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self.stopping.set()
+        self.pending.put(None)
+        if self.thread:
+            self.thread.join(timeout)
+        self.thread = None
+        self.engine.dispose()
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def submit(self, op: WriteOp, tenant_id: Optional[int] = None) -> "Future":
+        future: Future = Future()
+        self.pending.put((op, future, tenant_id))
+        return future
+
+    def _collect(self):
+        first = self.pending.get()
+        if first is None:
+            return []
+        batch = [first]
+        # A lone writer shouldn't pay the window: only linger while writes are
+        # actually arriving concurrently
+        window = self.window if self.last_batch > 1 or not self.pending.empty() else 0.0
+        deadline = time.monotonic() + window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.pending.get(timeout=remaining) if remaining > 0 else self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.stopping.set()
+                break
+            batch.append(item)
+        self.last_batch = len(batch)
+        return batch
+
+    def _run(self):
+        while not self.stopping.is_set() or not self.pending.empty():
+            batch = self._collect()
+            if batch:
+                self._apply(batch)
+
+    def _apply(self, batch):
+        session = self.session_factory()
+        outcomes = []
+        try:
+            with session.begin():
+                for op, future, tenant_id in batch:
+                    # Each operation sees only its own tenant's rows
+                    session.info["tenant_id"] = tenant_id
+                    try:
+                        with session.begin_nested():
+                            outcomes.append((future, op(session), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+        except Exception as exc:
+            # The shared COMMIT failed: nothing in this batch was written
+            for _, future, _ in batch:
+                future.set_exception(exc)
+            return
+        finally:
+            session.expunge_all()
+            session.close()
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+writer: Optional[GroupCommitWriter] = GroupCommitWriter() if GROUP_COMMIT else None
+
+
+def start():
+    if writer is not None and not writer.running:
+        writer.start()
+
+
+def stop():
+    if writer is not None and writer.running:
+        writer.stop()
+
+
+def execute(db: Session, op: WriteOp) -> T:
+    """Run a write operation and commit it.
+
+    With FLEETNOVA_GROUP_COMMIT=1 and the writer running, the operation is
+    batched with concurrent writes on the writer thread; otherwise it runs
+    on the request's own session followed by a normal commit. Tenants with
+    their own database always take the second path.
+    """
+    if writer is not None and writer.running and db.get_bind() is primary_engine:
+        return writer.submit(op, db.info.get("tenant_id")).result()
+    result = op(db)
+    db.commit()
+    return result
@@ -1,19 +1,151 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from itertools import cycle
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from ..core.config import DEFAULT_TENANT_ID, READ_REPLICA_URLS, READ_YOUR_WRITES_SECONDS, TENANT_CACHE_SECONDS
+from ..core.security import bearer_claims
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./fleetflow.db"
 
+def _connect_args(url: str) -> dict:
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args=_connect_args(SQLALCHEMY_DATABASE_URL)
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Each replica gets its own engine and therefore its own connection pool
+replica_engines = [create_engine(url, connect_args=_connect_args(url)) for url in READ_REPLICA_URLS]
+_replica_cycle = cycle(replica_engines)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+_last_write = {}  # user key -> time.monotonic() of that user's last successful write in this process
+# Other workers learn about a write from the client, which sends back the
+# wall-clock time it was given in this cookie or header
+LAST_WRITE_COOKIE = "fleetnova_last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+_routing_lock = threading.Lock()
+
+# Tenants moved to their own database: url -> engine, and tenant id -> (url or None, cached until)
+_tenant_engines: Dict[str, Engine] = {}
+_tenant_urls: Dict[int, Tuple[Optional[str], float]] = {}
+# Run against every tenant engine before first use (create tables, install triggers...)
+tenant_engine_setup: List[Callable[[Engine], None]] = []
+
 Base = declarative_base()
 
-def get_db():
+def request_tenant(request: Optional[Request]) -> Optional[int]:
+    """Tenant of the request's bearer token; tokens issued before tenants belong to the default one.
+
+    None for anonymous requests.
+    """
+    claims = bearer_claims(request.headers.get("Authorization", "")) if request is not None else None
+    return claims.get("tid", DEFAULT_TENANT_ID) if claims else None
+
+def required_tenant(request: Optional[Request]) -> int:
+    """Like request_tenant, but a request-scoped session never goes unscoped: no tenant, no session."""
+    tenant_id = request_tenant(request)
+    if tenant_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return tenant_id
+
+def _tenant_url(tenant_id: int) -> Optional[str]:
+    now = time.monotonic()
+    with _routing_lock:
+        cached = _tenant_urls.get(tenant_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    with engine.connect() as connection:
+        url = connection.execute(
+            text("SELECT database_url FROM tenants WHERE id = :id"), {"id": tenant_id}
+        ).scalar()
+    with _routing_lock:
+        _tenant_urls[tenant_id] = (url, now + TENANT_CACHE_SECONDS)
+    return url
+
+def forget_tenant(tenant_id: int):
+    """Drop the cached routing for `tenant_id`, e.g. right after it was moved."""
+    with _routing_lock:
+        _tenant_urls.pop(tenant_id, None)
+
+def tenant_engine(tenant_id: Optional[int]) -> Engine:
+    """The tenant's own database when it has one, otherwise the shared primary."""
+    url = _tenant_url(tenant_id) if tenant_id is not None else None
+    if not url:
+        return engine
+    with _routing_lock:
+        existing = _tenant_engines.get(url)
+    if existing is not None:
+        return existing
+    new = create_engine(url, connect_args=_connect_args(url))
+    for setup in tenant_engine_setup:
+        setup(new)
+    with _routing_lock:
+        return _tenant_engines.setdefault(url, new)
+
+def all_engines() -> List[Engine]:
+    """The primary plus every tenant database opened so far."""
+    with _routing_lock:
+        return [engine] + list(_tenant_engines.values())
+
+def open_tenant_engines():
+    """Open every tenant database up front, so job workers poll them from the start."""
+    with engine.connect() as connection:
+        ids = connection.execute(text("SELECT id FROM tenants WHERE database_url IS NOT NULL")).scalars().all()
+    for tenant_id in ids:
+        tenant_engine(tenant_id)
+
+def get_db(request: Request = None):
+    tenant_id = required_tenant(request)
+    db = SessionLocal(bind=tenant_engine(tenant_id), info={"tenant_id": tenant_id})
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_shared_db():
+    """Unscoped session on the primary, which holds users and tenants for every tenant.
+
+    Only for auth and maintenance code that must see every tenant.
+    """
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def record_write(user_key: str):
+    """Pin `user_key`'s reads to the primary for READ_YOUR_WRITES_SECONDS."""
+    now = time.monotonic()
+    with _routing_lock:
+        _last_write[user_key] = now
+        if len(_last_write) > 10000:
+            for key, written in list(_last_write.items()):
+                if now - written > READ_YOUR_WRITES_SECONDS:
+                    del _last_write[key]
+
+def read_engine(user_key: Optional[str] = None, last_write: Optional[float] = None):
+    """Next replica in round-robin order, or the primary when there is none or the user just wrote.
+
+    `last_write` is the epoch time the client reports for its last write,
+    which may have gone through another worker.
+    """
+    if not replica_engines:
+        return engine
+    if last_write is not None and time.time() - last_write < READ_YOUR_WRITES_SECONDS:
+        return engine
+    with _routing_lock:
+        written = _last_write.get(user_key) if user_key is not None else None
+        if written is not None and time.monotonic() - written < READ_YOUR_WRITES_SECONDS:
+            return engine
+        return next(_replica_cycle)
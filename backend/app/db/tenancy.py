@@ -0,0 +1,58 @@
+from typing import Optional
+from sqlalchemy import Column, ForeignKey, Integer, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, declared_attr, with_loader_criteria
+from ..core.config import DEFAULT_TENANT_ID
+
+# Sessions carry their tenant in session.info["tenant_id"] (set by get_db and
+# get_read_db from the token). None means unscoped: login, background jobs and
+# maintenance scripts see every tenant.
+
+
+class TenantScoped:
+    """Rows owned by one tenant. Tenant sessions only see their own rows and stamp new ones."""
+
+    @declared_attr
+    def tenant_id(cls):
+        return Column(Integer, ForeignKey("tenants.id"), nullable=False, server_default=text(str(DEFAULT_TENANT_ID)))
+
+
+def session_tenant(db: Session) -> Optional[int]:
+    return db.info.get("tenant_id")
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _only_tenant_rows(state):
+    tenant_id = session_tenant(state.session)
+    if tenant_id is None or state.is_column_load or state.is_relationship_load:
+        return
+    if state.is_select or state.is_update or state.is_delete:
+        state.statement = state.statement.options(
+            with_loader_criteria(TenantScoped, lambda cls: cls.tenant_id == tenant_id, include_aliases=True)
+        )
+
+
+@event.listens_for(Session, "transient_to_pending")
+def _stamp_tenant(session, instance):
+    tenant_id = session_tenant(session)
+    if tenant_id is not None and isinstance(instance, TenantScoped) and instance.tenant_id is None:
+        instance.tenant_id = tenant_id
+
+
+def filters(db: Session, table) -> list:
+    """The tenant condition for Core statements on `table`, which the ORM hooks above don't see."""
+    tenant_id = session_tenant(db)
+    if tenant_id is None or "tenant_id" not in table.c:
+        return []
+    return [table.c.tenant_id == tenant_id]
+
+
+def install(engine: Engine):
+    """Make sure the default tenant exists. Run after upgrade.add_missing_columns, which
+    gives rows from before tenants tenant_id = DEFAULT_TENANT_ID."""
+    with engine.begin() as connection:
+        if connection.execute(text("SELECT 1 FROM tenants WHERE id = :id"), {"id": DEFAULT_TENANT_ID}).first() is None:
+            connection.execute(
+                text("INSERT INTO tenants (id, slug, name) VALUES (:id, 'default', 'Default')"),
+                {"id": DEFAULT_TENANT_ID},
+            )
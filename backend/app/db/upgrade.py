@@ -0,0 +1,84 @@
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+from .session import Base
+
+
+def _default_sql(column, dialect) -> str:
+    """DEFAULT clause for a column added to a table that already has rows, or ""."""
+    if column.server_default is not None:
+        return " DEFAULT " + str(column.server_default.arg.compile(dialect=dialect))
+    if column.default is not None and column.default.is_scalar:
+        value = literal(column.default.arg, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        return f" DEFAULT {value}"
+    return ""
+
+
+def add_missing_columns(engine: Engine):
+    """ALTER tables created by an older release to add the columns models gained since.
+
+    create_all skips tables that already exist, so without this an upgraded
+    database fails on the first query touching a new column. Existing rows get
+    the column's default, or NULL.
+    """
+    inspector = inspect(engine)
+    dialect = engine.dialect
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                default = _default_sql(column, dialect)
+                if not column.nullable and not default:
+                    raise RuntimeError(f"Cannot add {table.name}.{column.name}: NOT NULL without a default")
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+                connection.execute(text(ddl + ("" if column.nullable else " NOT NULL") + default))
+
+
+def rebuild_autoincrement(engine: Engine):
+    """Recreate SQLite tables whose model asks for AUTOINCREMENT but which were created without it.
+
+    sqlite_autoincrement only takes effect in CREATE TABLE, so tables from an
+    older release keep handing out max(id) + 1 and reuse the ids of deleted or
+    archived rows. SQLite cannot ALTER this, so rows are copied into a new
+    table, which also starts sqlite_sequence at the highest id copied.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not table.dialect_options["sqlite"]["autoincrement"]:
+                continue
+            stored = connection.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+            ).scalar()
+            if stored is None or "AUTOINCREMENT" in stored.upper():
+                continue
+            rebuilt = f"{table.name}__rebuild"
+            ddl = str(CreateTable(table).compile(dialect=engine.dialect)).strip()
+            connection.execute(text(ddl.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {rebuilt} ", 1)))
+            columns = ", ".join(c.name for c in table.columns)
+            connection.execute(text(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table.name}"))
+            connection.execute(text(f"DROP TABLE {table.name}"))
+            connection.execute(text(f"ALTER TABLE {rebuilt} RENAME TO {table.name}"))
+            for index in table.indexes:
+                index.create(connection)
+
+
+def sync_indexes(engine: Engine):
+    """Create model indexes that existing tables lack, and rebuild those whose uniqueness changed."""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"]: bool(index["unique"]) for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing and existing[index.name] != bool(index.unique):
+                    index.drop(connection)
+                    del existing[index.name]
+                if index.name not in existing:
+                    index.create(connection)
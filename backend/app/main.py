@@ -1,15 +1,30 @@
-from fastapi import FastAPI, Depends, HTTPException
+import math
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from .db.session import engine, Base, get_db
-from .models import models
-from .schemas import schemas
-from .api import auth, vehicles, drivers, trips, maintenance, fuel, stats
+from .db import group_commit
+from .db.session import LAST_WRITE_COOKIE, LAST_WRITE_HEADER, engine, open_tenant_engines, record_write
+from .api import auth, vehicles, drivers, trips, maintenance, fuel, stats, analytics, search, telemetry
+from .services import jobs, post_trip, tenants  # post_trip registers its job handlers
+from .api.deps import token_subject
+from .api.idempotency import IdempotencyMiddleware
+from .api.ratelimit import RateLimitMiddleware
+from .core.config import RATE_LIMIT, READ_YOUR_WRITES_SECONDS
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create database tables; tenant databases get the same treatment when first opened
+tenants.prepare_database(engine)
 
-app = FastAPI(title="Fleetnova API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    open_tenant_engines()
+    group_commit.start()
+    jobs.start_workers()
+    yield
+    jobs.stop_workers()
+    group_commit.stop()
+
+app = FastAPI(title="Fleetnova API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,6 +34,29 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Retried POST/PATCH requests carrying an Idempotency-Key get the first response replayed
+app.add_middleware(IdempotencyMiddleware)
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    # Keep a user's reads on the primary right after they changed something
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        user_key = token_subject(request)
+        if user_key is not None:
+            record_write(user_key)
+            # Hand the time to the client too, so whichever worker serves its next read knows
+            written = f"{time.time():.3f}"
+            response.headers[LAST_WRITE_HEADER] = written
+            response.set_cookie(
+                LAST_WRITE_COOKIE, written, max_age=math.ceil(READ_YOUR_WRITES_SECONDS), httponly=True, samesite="lax"
+            )
+    return response
+
+# Outermost, so a throttled request never reaches the database
+if RATE_LIMIT:
+    app.add_middleware(RateLimitMiddleware)
+
 app.include_router(auth.router)
 app.include_router(vehicles.router)
 app.include_router(drivers.router)
@@ -26,6 +64,9 @@ app.include_router(trips.router)
 app.include_router(maintenance.router)
 app.include_router(fuel.router)
 app.include_router(stats.router)
+app.include_router(analytics.router)
+app.include_router(search.router)
+app.include_router(telemetry.router)
 
 @app.get("/")
 def read_root():
@@ -35,16 +76,3 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
-
-# Placeholder for future routes (to be split into routers)
-@app.get("/vehicles", response_model=list[schemas.VehicleOut])
-def get_vehicles(db: Session = Depends(get_db)):
-    return db.query(models.Vehicle).all()
-
-@app.post("/vehicles", response_model=schemas.VehicleOut)
-def create_vehicle(vehicle: schemas.VehicleCreate, db: Session = Depends(get_db)):
-    db_vehicle = models.Vehicle(**vehicle.dict())
-    db.add(db_vehicle)
-    db.commit()
-    db.refresh(db_vehicle)
-    return db_vehicle
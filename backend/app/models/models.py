@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Date
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Date, LargeBinary, Boolean, Text, Index, func, text
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime
+from ..core.config import DEFAULT_TENANT_ID
 from ..db.session import Base
+from ..db.tenancy import TenantScoped
 
 class UserRole(str, enum.Enum):
     ADMIN = "Admin"
@@ -34,18 +36,41 @@ class TripStatus(str, enum.Enum):
     COMPLETED = "Completed"
     CANCELLED = "Cancelled"
 
+class JobStatus(str, enum.Enum):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+
+class Tenant(Base):
+    """A depot or customer. Its rows live in the shared database unless database_url points elsewhere."""
+    __tablename__ = "tenants"
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String, unique=True, index=True)
+    name = Column(String)
+    database_url = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     role = Column(Enum(UserRole), default=UserRole.DRIVER)
+    # Users stay in the shared database: login has to find them before the tenant is known
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, server_default=text(str(DEFAULT_TENANT_ID)), index=True)
 
-class Vehicle(Base):
+class Vehicle(TenantScoped, Base):
     __tablename__ = "vehicles"
+    __table_args__ = (
+        Index("ix_vehicles_tenant_name", "tenant_id", "name"),
+        Index("ix_vehicles_tenant_status", "tenant_id", "status"),
+        # Plates and licenses are unique within a tenant, not across tenants sharing a database
+        Index("uq_vehicles_tenant_plate", "tenant_id", "plate", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String)
-    plate = Column(String, unique=True, index=True)
+    name = Column(String, index=True)
+    plate = Column(String, index=True)
     vehicle_type = Column(Enum(VehicleType))
     capacity = Column(Float)
     odometer = Column(Float, default=0.0)
@@ -56,11 +81,16 @@ class Vehicle(Base):
     maintenance_logs = relationship("MaintenanceLog", back_populates="vehicle")
     fuel_logs = relationship("FuelLog", back_populates="vehicle")
 
-class Driver(Base):
+class Driver(TenantScoped, Base):
     __tablename__ = "drivers"
+    __table_args__ = (
+        Index("ix_drivers_tenant_name", "tenant_id", "name"),
+        Index("ix_drivers_tenant_status", "tenant_id", "status"),
+        Index("uq_drivers_tenant_license_number", "tenant_id", "license_number", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String)
-    license_number = Column(String, unique=True, index=True)
+    name = Column(String, index=True)
+    license_number = Column(String, index=True)
     license_category = Column(Enum(VehicleType))
     license_expiry = Column(Date)
     safety_score = Column(Float, default=100.0)
@@ -68,40 +98,206 @@ class Driver(Base):
     
     trips = relationship("Trip", back_populates="driver")
 
-class Trip(Base):
+class Trip(TenantScoped, Base):
     __tablename__ = "trips"
+    __table_args__ = (
+        Index("ix_trips_tenant_created_at", "tenant_id", "created_at"),
+        Index("ix_trips_tenant_status", "tenant_id", "status"),
+        Index("ix_trips_tenant_driver_id", "tenant_id", "driver_id"),
+        # Never hand out an id again once its row has moved to the archive
+        {"sqlite_autoincrement": True},
+    )
     id = Column(Integer, primary_key=True, index=True)
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"))
-    driver_id = Column(Integer, ForeignKey("drivers.id"))
+    driver_id = Column(Integer, ForeignKey("drivers.id"), index=True)
     cargo_weight = Column(Float)
     origin = Column(String)
     destination = Column(String)
     status = Column(Enum(TripStatus), default=TripStatus.DRAFT)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    completed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    completed_at = Column(DateTime, nullable=True, index=True)
+    start_odometer = Column(Float, nullable=True)  # vehicle odometer at dispatch
+    final_odometer = Column(Float, nullable=True)
+    odometer_anomaly = Column(Boolean, default=False)  # set by post-trip processing
     
     vehicle = relationship("Vehicle", back_populates="trips")
     driver = relationship("Driver", back_populates="trips")
 
-class MaintenanceLog(Base):
+class MaintenanceLog(TenantScoped, Base):
     __tablename__ = "maintenance_logs"
+    __table_args__ = (
+        Index("ix_maintenance_logs_tenant_service_date", "tenant_id", "service_date"),
+        Index("ix_maintenance_logs_tenant_vehicle_id", "tenant_id", "vehicle_id"),
+        {"sqlite_autoincrement": True},
+    )
     id = Column(Integer, primary_key=True, index=True)
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"))
     service_type = Column(String)
     description = Column(String)
     cost = Column(Float)
-    service_date = Column(Date)
+    service_date = Column(Date, index=True)
     next_due_date = Column(Date)
     
     vehicle = relationship("Vehicle", back_populates="maintenance_logs")
 
-class FuelLog(Base):
+class FuelLog(TenantScoped, Base):
     __tablename__ = "fuel_logs"
+    __table_args__ = (
+        Index("ix_fuel_logs_tenant_date", "tenant_id", "date"),
+        Index("ix_fuel_logs_tenant_vehicle_id", "tenant_id", "vehicle_id"),
+        {"sqlite_autoincrement": True},
+    )
     id = Column(Integer, primary_key=True, index=True)
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"))
     liters = Column(Float)
     cost = Column(Float)
-    date = Column(Date)
+    date = Column(Date, index=True)
     odometer_reading = Column(Float)
     
     vehicle = relationship("Vehicle", back_populates="fuel_logs")
+
+# Cold storage: same columns as the hot tables, filled and drained by app/services/archive.py
+
+class ArchivedTrip(TenantScoped, Base):
+    __tablename__ = "archived_trips"
+    __table_args__ = (Index("ix_archived_trips_tenant_created_at", "tenant_id", "created_at"),)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id"))
+    driver_id = Column(Integer, ForeignKey("drivers.id"), index=True)
+    cargo_weight = Column(Float)
+    origin = Column(String)
+    destination = Column(String)
+    status = Column(Enum(TripStatus))
+    created_at = Column(DateTime, index=True)
+    completed_at = Column(DateTime, nullable=True)
+    start_odometer = Column(Float, nullable=True)
+    final_odometer = Column(Float, nullable=True)
+    odometer_anomaly = Column(Boolean, default=False)
+    archived_at = Column(DateTime, server_default=func.now())
+
+    vehicle = relationship("Vehicle", viewonly=True)
+    driver = relationship("Driver", viewonly=True)
+
+class ArchivedMaintenanceLog(TenantScoped, Base):
+    __tablename__ = "archived_maintenance_logs"
+    __table_args__ = (Index("ix_archived_maintenance_logs_tenant_service_date", "tenant_id", "service_date"),)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id"))
+    service_type = Column(String)
+    description = Column(String)
+    cost = Column(Float)
+    service_date = Column(Date, index=True)
+    next_due_date = Column(Date)
+    archived_at = Column(DateTime, server_default=func.now())
+
+class ArchivedFuelLog(TenantScoped, Base):
+    __tablename__ = "archived_fuel_logs"
+    __table_args__ = (Index("ix_archived_fuel_logs_tenant_date", "tenant_id", "date"),)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id"))
+    liters = Column(Float)
+    cost = Column(Float)
+    date = Column(Date, index=True)
+    odometer_reading = Column(Float)
+    archived_at = Column(DateTime, server_default=func.now())
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_records"
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String, unique=True, index=True)  # user:method:path:key
+    request_hash = Column(String)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    content_type = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # purged after IDEMPOTENCY_TTL_HOURS
+
+class Job(Base):
+    """Durable background work, processed by app/services/jobs.py workers."""
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, index=True)
+    payload = Column(Text)  # JSON
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED)
+    attempts = Column(Integer, default=0)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class VehicleRollup(Base):
+    """Per-vehicle trip, fuel and cost totals, kept current by post-trip processing."""
+    __tablename__ = "vehicle_rollups"
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id"), primary_key=True)
+    completed_trips = Column(Integer, default=0)
+    distance = Column(Float, default=0.0)
+    fuel_liters = Column(Float, default=0.0)
+    fuel_cost = Column(Float, default=0.0)
+    maintenance_cost = Column(Float, default=0.0)
+    route_distance = Column(Float, default=0.0)  # km between origin and destination cities
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    @property
+    def cost_per_km(self):
+        if not self.route_distance:
+            return None
+        return round(((self.fuel_cost or 0.0) + (self.maintenance_cost or 0.0)) / self.route_distance, 3)
+
+class SafetyScoreRun(Base):
+    """One pass of the safety score engine; incremental runs start from the last one."""
+    __tablename__ = "safety_score_runs"
+    id = Column(Integer, primary_key=True, index=True)
+    incremental = Column(Boolean, default=False)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    drivers_scored = Column(Integer, default=0)
+
+class City(Base):
+    """Coordinates for trip origins and destinations, seeded from app/data/cities.csv."""
+    __tablename__ = "cities"
+    key = Column(String, primary_key=True)  # normalized name, see services/distance.py
+    name = Column(String)
+    latitude = Column(Float)
+    longitude = Column(Float)
+
+class RouteDistance(Base):
+    """Memoized distance between two cities, stored once per unordered pair."""
+    __tablename__ = "route_distances"
+    origin = Column(String, primary_key=True)
+    destination = Column(String, primary_key=True)
+    distance_km = Column(Float)
+
+class TelemetryPoint(Base):
+    """Raw vehicle ping. Append-only; reads go through telemetry_rollups and the
+    only secondary index is on ts, for retention."""
+    __tablename__ = "telemetry_points"
+    id = Column(Integer, primary_key=True)
+    vehicle_id = Column(Integer)
+    ts = Column(Float, index=True)  # epoch seconds, UTC
+    odometer = Column(Float, nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    fuel_level = Column(Float, nullable=True)
+
+class TelemetryRollup(Base):
+    """Per-vehicle aggregate of telemetry over one minute, hour or day bucket."""
+    __tablename__ = "telemetry_rollups"
+    resolution = Column(Integer, primary_key=True)  # bucket width in seconds
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id"), primary_key=True)
+    bucket_start = Column(Integer, primary_key=True)  # epoch seconds, UTC
+    points = Column(Integer, default=0)
+    odometer_min = Column(Float, nullable=True)
+    odometer_max = Column(Float, nullable=True)
+    fuel_level_min = Column(Float, nullable=True)
+    fuel_level_max = Column(Float, nullable=True)
+    fuel_level_sum = Column(Float, default=0.0)
+    fuel_level_count = Column(Integer, default=0)
+    latitude = Column(Float, nullable=True)  # last known position in the bucket
+    longitude = Column(Float, nullable=True)
+    located_at = Column(Float, nullable=True)
+
+    @property
+    def fuel_level_avg(self):
+        return self.fuel_level_sum / self.fuel_level_count if self.fuel_level_count else None
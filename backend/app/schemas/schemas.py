@@ -75,6 +75,11 @@ class TripOut(TripBase):
     status: TripStatus
     created_at: datetime
     completed_at: Optional[datetime] = None
+    start_odometer: Optional[float] = None
+    final_odometer: Optional[float] = None
+    odometer_anomaly: Optional[bool] = False
+    distance_km: Optional[float] = None  # origin to destination, see services/distance.py
+    eta_hours: Optional[float] = None
     driver: Optional[DriverOut] = None
     vehicle: Optional[VehicleOut] = None
     class Config:
@@ -110,3 +115,52 @@ class FuelLogOut(FuelLogBase):
     id: int
     class Config:
         from_attributes = True
+
+class VehicleRollupOut(BaseModel):
+    vehicle_id: int
+    completed_trips: int
+    distance: float
+    fuel_liters: float
+    fuel_cost: float
+    maintenance_cost: float
+    route_distance: float
+    cost_per_km: Optional[float] = None
+    updated_at: datetime
+    class Config:
+        from_attributes = True
+
+class SearchResults(BaseModel):
+    vehicles: List[VehicleOut] = []
+    drivers: List[DriverOut] = []
+
+class RateLimitCounter(BaseModel):
+    role: str
+    route_class: str
+    allowed: int
+    limited: int
+
+class RateLimitMetrics(BaseModel):
+    backend: str
+    inflight: int
+    max_inflight: int
+    shed: int
+    backend_errors: int
+    buckets: List[RateLimitCounter] = []
+
+class TelemetryIngestResult(BaseModel):
+    accepted: int
+    rejected: int
+
+class TelemetryBucketOut(BaseModel):
+    vehicle_id: int
+    bucket_start: datetime
+    points: int
+    odometer_min: Optional[float] = None
+    odometer_max: Optional[float] = None
+    fuel_level_min: Optional[float] = None
+    fuel_level_max: Optional[float] = None
+    fuel_level_avg: Optional[float] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    class Config:
+        from_attributes = True
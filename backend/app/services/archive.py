@@ -0,0 +1,185 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy import DateTime, and_, delete, func, insert, or_, select, text, true
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from ..core.config import ARCHIVE_AFTER_DAYS
+from ..models import models
+from . import projection
+
+# kind -> (hot model, cold model, column used for date ranges)
+TIERS = {
+    "trips": (models.Trip, models.ArchivedTrip, "created_at"),
+    "fuel": (models.FuelLog, models.ArchivedFuelLog, "date"),
+    "maintenance": (models.MaintenanceLog, models.ArchivedMaintenanceLog, "service_date"),
+}
+
+FINISHED_TRIP_STATUSES = (models.TripStatus.COMPLETED, models.TripStatus.CANCELLED)
+
+# Ids per INSERT ... SELECT / DELETE pair, under SQLite's bound parameter limit
+MOVE_CHUNK_ROWS = 500
+
+
+def _cold_condition(kind: str, model, cutoff: datetime):
+    """Rows of `model` that are finished and older than `cutoff`."""
+    if kind == "trips":
+        return and_(
+            model.status.in_(FINISHED_TRIP_STATUSES),
+            func.coalesce(model.completed_at, model.created_at) < cutoff,
+        )
+    if kind == "fuel":
+        return model.date < cutoff.date()
+    # A maintenance log stays hot while its next service is still ahead
+    return and_(
+        model.service_date < cutoff.date(),
+        or_(model.next_due_date.is_(None), model.next_due_date < cutoff.date()),
+    )
+
+
+def date_range_condition(column, start_date: Optional[date], end_date: Optional[date]):
+    clauses = []
+    is_datetime = isinstance(column.type, DateTime)
+    if start_date:
+        clauses.append(column >= (datetime.combine(start_date, time.min) if is_datetime else start_date))
+    if end_date:
+        if is_datetime:
+            clauses.append(column < datetime.combine(end_date + timedelta(days=1), time.min))
+        else:
+            clauses.append(column <= end_date)
+    return and_(true(), *clauses)
+
+
+def _shared_columns(hot, cold):
+    return [c.name for c in hot.__table__.columns if c.name in cold.__table__.columns]
+
+
+def _move(db: Session, source, target, condition) -> int:
+    """Copy the rows of `source` matching `condition` into `target`, then delete exactly those rows.
+
+    Ids are read once and used for both statements, so a row that starts
+    matching in between is never deleted without its copy. A row whose id is
+    already taken in `target` (ids reused by a database from before
+    AUTOINCREMENT) is copied under a new id above both tiers.
+    """
+    names = _shared_columns(source, target)
+    columns = [source.__table__.c[n] for n in names]
+    target_id = target.__table__.c.id
+    ids = [row[0] for row in db.execute(select(source.id).where(condition))]
+    next_id = None
+    for start in range(0, len(ids), MOVE_CHUNK_ROWS):
+        chunk = ids[start:start + MOVE_CHUNK_ROWS]
+        # Core columns: an id held by another tenant's row collides as well
+        taken = set(db.execute(select(target_id).where(target_id.in_(chunk))).scalars())
+        free = [i for i in chunk if i not in taken]
+        if free:
+            db.execute(insert(target).from_select(names, select(*columns).where(source.id.in_(free))))
+        if taken:
+            if next_id is None:
+                next_id = max(
+                    db.execute(select(func.max(source.__table__.c.id))).scalar() or 0,
+                    db.execute(select(func.max(target_id))).scalar() or 0,
+                ) + 1
+            rows = [dict(row) for row in db.execute(select(*columns).where(source.id.in_(taken))).mappings()]
+            for row in rows:
+                row["id"], next_id = next_id, next_id + 1
+            db.execute(insert(target.__table__), rows)
+        db.execute(
+            delete(source)
+            .where(source.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+    return len(ids)
+
+
+def archive_old_rows(db: Session, older_than_days: int = ARCHIVE_AFTER_DAYS, kinds=None) -> dict:
+    """Move finished rows older than `older_than_days` into the archive tables.
+
+    Every kind is copied and deleted inside one transaction, so a crash leaves
+    each row in exactly one tier.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = {}
+    for kind in kinds or TIERS:
+        hot, cold, _ = TIERS[kind]
+        moved[kind] = _move(db, hot, cold, _cold_condition(kind, hot, cutoff))
+    db.commit()
+    return moved
+
+
+def restore_rows(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None, kinds=None) -> dict:
+    """Move archived rows inside [start_date, end_date] back into the hot tables."""
+    restored = {}
+    for kind in kinds or TIERS:
+        hot, cold, column = TIERS[kind]
+        restored[kind] = _move(db, cold, hot, date_range_condition(getattr(cold, column), start_date, end_date))
+    db.commit()
+    return restored
+
+
+def install(engine: Engine):
+    """Start SQLite's id sequence for each hot table above every archived id, so
+    a new row can never take the id of one waiting in the archive."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as connection:
+        for hot, cold, _ in TIERS.values():
+            top = connection.execute(select(func.max(cold.id))).scalar()
+            if top is None:
+                continue
+            name = hot.__tablename__
+            seq = connection.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": name}).scalar()
+            if seq is None:
+                connection.execute(text("INSERT INTO sqlite_sequence(name, seq) VALUES (:name, :seq)"), {"name": name, "seq": top})
+            elif seq < top:
+                connection.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name"), {"name": name, "seq": top})
+
+
+def verify(db: Session) -> dict:
+    """Report row counts per tier and any rows that broke the tiering rules."""
+    report = {}
+    for kind, (hot, cold, _) in TIERS.items():
+        entry = {
+            "hot": db.query(func.count(hot.id)).scalar(),
+            "archived": db.query(func.count(cold.id)).scalar(),
+            "in_both_tiers": db.query(func.count(cold.id)).filter(cold.id.in_(select(hot.id))).scalar(),
+        }
+        if kind == "trips":
+            entry["unfinished_archived"] = (
+                db.query(func.count(cold.id)).filter(cold.status.notin_(FINISHED_TRIP_STATUSES)).scalar()
+            )
+        report[kind] = entry
+    return report
+
+
+def needs_archive(db: Session, kind: str, start_date: Optional[date], end_date: Optional[date] = None) -> bool:
+    """True when [start_date, end_date] overlaps the dates held in the archive.
+
+    An open lower bound reaches back into the archive whenever it has rows
+    up to end_date.
+    """
+    _, cold, column = TIERS[kind]
+    oldest, newest = db.query(func.min(getattr(cold, column)), func.max(getattr(cold, column))).one()
+    if newest is None:
+        return False
+    if isinstance(newest, datetime):
+        oldest, newest = oldest.date(), newest.date()
+    if start_date is not None and start_date > newest:
+        return False
+    return end_date is None or end_date >= oldest
+
+
+def read(db: Session, kind: str, start_date: Optional[date] = None, end_date: Optional[date] = None, fieldset: Optional[projection.Fieldset] = None) -> list:
+    """Hot rows in the range, plus archived ones only when the range needs them.
+
+    With a fieldset, returns projected dicts instead of ORM objects.
+    """
+    hot, cold, column = TIERS[kind]
+    if fieldset is not None:
+        rows = projection.rows(db, hot, fieldset, date_range_condition(getattr(hot, column), start_date, end_date))
+        if needs_archive(db, kind, start_date, end_date):
+            rows += projection.rows(db, cold, fieldset, date_range_condition(getattr(cold, column), start_date, end_date))
+        return rows
+    rows = db.query(hot).filter(date_range_condition(getattr(hot, column), start_date, end_date)).all()
+    if needs_archive(db, kind, start_date, end_date):
+        rows += db.query(cold).filter(date_range_condition(getattr(cold, column), start_date, end_date)).all()
+    return rows
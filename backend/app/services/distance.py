@@ -0,0 +1,136 @@
+import csv
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from ..core.config import AVERAGE_SPEED_KMH, ROUTE_DETOUR_FACTOR
+from ..db.session import SessionLocal
+from ..models import models
+
+CITIES_CSV = Path(__file__).resolve().parent.parent / "data" / "cities.csv"
+EARTH_RADIUS_KM = 6371.0
+MEMO_LIMIT = 100000
+
+Pair = Tuple[str, str]
+
+_coords: Optional[Dict[str, Tuple[float, float]]] = None
+_memo: Dict[Pair, Optional[float]] = {}  # canonical pair -> km, None when a city is unknown
+_lock = threading.Lock()
+
+
+def normalize(name: Optional[str]) -> str:
+    """'  New York, NY ' -> 'new york'. Trip endpoints are free text."""
+    if not name:
+        return ""
+    return " ".join(name.split(",")[0].lower().split())
+
+
+def _canonical(origin: str, destination: str) -> Pair:
+    return (origin, destination) if origin <= destination else (destination, origin)
+
+
+def install(engine: Engine):
+    """Seed the cities table with any bundled coordinates it does not have yet."""
+    db = SessionLocal(bind=engine)
+    try:
+        known = {row.key for row in db.query(models.City.key)}
+        with open(CITIES_CSV, newline="") as handle:
+            for row in csv.DictReader(handle):
+                key = normalize(row["name"])
+                if key not in known:
+                    db.add(models.City(key=key, name=row["name"], latitude=float(row["latitude"]), longitude=float(row["longitude"])))
+                    known.add(key)
+        db.commit()
+    finally:
+        db.close()
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance; accepts scalars or NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _city_coords(db: Session) -> Dict[str, Tuple[float, float]]:
+    global _coords
+    if _coords is None:
+        _coords = {row.key: (row.latitude, row.longitude) for row in db.query(models.City)}
+    return _coords
+
+
+def _persist(rows: list):
+    """Store newly computed pairs on the primary, whatever session the caller reads from."""
+    db = SessionLocal()
+    try:
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            statement = sqlite.insert(models.RouteDistance).on_conflict_do_nothing()
+        elif dialect == "postgresql":
+            statement = postgresql.insert(models.RouteDistance).on_conflict_do_nothing()
+        else:
+            return
+        db.execute(statement, rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def distances_km(db: Session, pairs: Iterable[Pair]) -> Dict[Pair, Optional[float]]:
+    """Road-distance estimates for (origin, destination) pairs, keyed by normalized pair.
+
+    Pairs come from the in-process memo, then the route_distances table; the
+    rest are computed in one vectorized haversine pass and persisted.
+    """
+    wanted = {(normalize(o), normalize(d)) for o, d in pairs}
+    canonical = {pair: _canonical(*pair) for pair in wanted}
+    with _lock:
+        missing = {c for c in canonical.values() if c not in _memo}
+
+    if missing:
+        # 1. Previously persisted pairs
+        origins = {o for o, _ in missing}
+        found = {}
+        for chunk_start in range(0, len(origins), 500):
+            chunk = list(origins)[chunk_start:chunk_start + 500]
+            for row in db.query(models.RouteDistance).filter(models.RouteDistance.origin.in_(chunk)):
+                pair = (row.origin, row.destination)
+                if pair in missing:
+                    found[pair] = row.distance_km
+        todo = [pair for pair in missing if pair not in found]
+
+        # 2. Everything else in one NumPy pass over the city coordinates
+        coords = _city_coords(db)
+        computable = [pair for pair in todo if pair[0] in coords and pair[1] in coords]
+        if computable:
+            a = np.array([coords[o] for o, _ in computable])
+            b = np.array([coords[d] for _, d in computable])
+            km = np.round(haversine_km(a[:, 0], a[:, 1], b[:, 0], b[:, 1]) * ROUTE_DETOUR_FACTOR, 1)
+            computed = dict(zip(computable, km.tolist()))
+            _persist([{"origin": o, "destination": d, "distance_km": v} for (o, d), v in computed.items()])
+            found.update(computed)
+
+        with _lock:
+            if len(_memo) > MEMO_LIMIT:
+                _memo.clear()
+            for pair in missing:
+                _memo[pair] = found.get(pair)
+
+    with _lock:
+        return {pair: _memo.get(c) for pair, c in canonical.items()}
+
+
+def eta_hours(distance: Optional[float]) -> Optional[float]:
+    return round(distance / AVERAGE_SPEED_KMH, 2) if distance is not None else None
+
+
+def annotate_trips(db: Session, trips: list) -> list:
+    """Set distance_km and eta_hours on trip objects for TripOut."""
+    known = distances_km(db, [(t.origin, t.destination) for t in trips])
+    for trip in trips:
+        trip.distance_km = known.get((normalize(trip.origin), normalize(trip.destination)))
+        trip.eta_hours = eta_hours(trip.distance_km)
+    return trips
@@ -0,0 +1,172 @@
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional
+from sqlalchemy import Boolean, Date, DateTime, Enum, Float, Integer, String, case, select, type_coerce, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from ..core.config import EXPORT_BATCH_ROWS
+from ..db import tenancy
+from . import archive, distance
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency, only needed for analytics exports
+    pa = None
+    pq = None
+
+FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def available() -> bool:
+    return pa is not None
+
+
+# Columns computed per batch from other columns instead of read from SQL:
+# dataset -> {name: source columns}
+DERIVED_COLUMNS = {
+    "trips": {"distance_km": ("origin", "destination")},
+}
+
+
+def column_names(dataset: str) -> List[str]:
+    hot, _, _ = archive.TIERS[dataset]
+    return [c.name for c in hot.__table__.columns if c.name != "tenant_id"] + list(DERIVED_COLUMNS.get(dataset, {}))
+
+
+def sql_columns(dataset: str, columns: List[str]) -> List[str]:
+    """Columns to SELECT: the requested ones plus whatever derived columns are built from."""
+    derived = DERIVED_COLUMNS.get(dataset, {})
+    names = [c for c in columns if c not in derived]
+    for name in columns:
+        for source in derived.get(name, ()):
+            if source not in names:
+                names.append(source)
+    return names
+
+
+def derivers(db: Session, dataset: str, columns: List[str], start_date: Optional[date], end_date: Optional[date], with_archive: bool) -> Dict[str, Callable]:
+    """Per-batch builders for the derived columns in `columns`."""
+    result = {}
+    if dataset == "trips" and "distance_km" in columns:
+        pairs_query = build_query(dataset, ["origin", "destination"], start_date, end_date, with_archive, tenancy.session_tenant(db)).subquery()
+        raw_pairs = db.execute(select(pairs_query.c.origin, pairs_query.c.destination).distinct()).all()
+        known = distance.distances_km(db, raw_pairs)
+        by_raw = {
+            (o, d): known.get((distance.normalize(o), distance.normalize(d))) for o, d in raw_pairs
+        }
+        result["distance_km"] = lambda cols: [by_raw.get(pair) for pair in zip(cols["origin"], cols["destination"])]
+    return result
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _select_column(column):
+    """Enums are stored by name; map them to their API values inside SQL."""
+    if isinstance(column.type, Enum):
+        raw = type_coerce(column, String)
+        return case(
+            {member.name: member.value for member in column.type.enum_class},
+            value=raw,
+            else_=raw,
+        ).label(column.name)
+    return column
+
+
+def build_query(dataset: str, columns: List[str], start_date: Optional[date], end_date: Optional[date], with_archive: bool, tenant_id: Optional[int] = None):
+    """Core SELECT with the projection, date range and tenant pushed into SQL."""
+    hot, cold, date_column = archive.TIERS[dataset]
+    selects = []
+    for model in (hot, cold) if with_archive else (hot,):
+        table = model.__table__
+        query = select(*[_select_column(table.c[name]) for name in columns]).where(
+            archive.date_range_condition(table.c[date_column], start_date, end_date)
+        )
+        if tenant_id is not None:
+            query = query.where(table.c.tenant_id == tenant_id)
+        selects.append(query)
+    return selects[0] if len(selects) == 1 else union_all(*selects)
+
+
+def schema(dataset: str, columns: List[str]):
+    hot, _, _ = archive.TIERS[dataset]
+    derived = DERIVED_COLUMNS.get(dataset, {})
+    return pa.schema([
+        pa.field(name, pa.float64() if name in derived else _arrow_type(hot.__table__.c[name]))
+        for name in columns
+    ])
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the response generator."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self.parts.append(chunk)
+        self.position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def stream(connection: Connection, query, names: List[str], arrow_schema, fmt: str, derived: Optional[Dict[str, Callable]] = None) -> Iterator[bytes]:
+    """Yield an Arrow IPC stream or Parquet file, one record batch per cursor fetch."""
+    sink = _ChunkSink()
+    writer = (
+        pa.ipc.new_stream(sink, arrow_schema)
+        if fmt == "arrow"
+        else pq.ParquetWriter(sink, arrow_schema, compression="zstd")
+    )
+    result = connection.execution_options(stream_results=True).execute(query)
+    try:
+        while True:
+            rows = result.fetchmany(EXPORT_BATCH_ROWS)
+            if not rows:
+                break
+            columns = dict(zip(names, zip(*rows)))
+            arrays = [
+                pa.array(derived[field.name](columns) if derived and field.name in derived else columns[field.name], type=field.type)
+                for field in arrow_schema
+            ]
+            batch = pa.RecordBatch.from_arrays(arrays, schema=arrow_schema)
+            if fmt == "arrow":
+                writer.write_batch(batch)
+            else:
+                writer.write_batch(batch, row_group_size=EXPORT_BATCH_ROWS)
+            yield sink.drain()
+    finally:
+        result.close()
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,194 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from ..core.config import (
+    JOB_BATCH_SIZE,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_SECONDS,
+    JOB_RETENTION_HOURS,
+    JOB_WORKERS,
+    IDEMPOTENCY_TTL_HOURS,
+)
+from ..db.session import SessionLocal, all_engines, engine
+from ..models import models
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(db, payloads). A handler gets a whole batch of one kind and
+# must be safe to run again for the same payloads (batches are retried as a unit).
+HANDLERS: Dict[str, Callable[[Session, List[dict]], None]] = {}
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_threads: List[threading.Thread] = []
+
+
+def handler(kind: str):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(db: Session, kind: str, payload: dict):
+    """Add a job to the caller's transaction; it becomes visible when they commit."""
+    db.add(models.Job(kind=kind, payload=json.dumps(payload)))
+    _wakeup.set()
+
+
+def _claim(db: Session, worker_id: str) -> List[models.Job]:
+    now = datetime.utcnow()
+    runnable = or_(
+        and_(models.Job.status == models.JobStatus.QUEUED, models.Job.run_after <= now),
+        # A worker died mid-batch: take its jobs back once the lease ran out
+        and_(
+            models.Job.status == models.JobStatus.RUNNING,
+            models.Job.locked_at < now - timedelta(seconds=JOB_LEASE_SECONDS),
+        ),
+    )
+    head = db.query(models.Job.kind).filter(runnable).order_by(models.Job.id).first()
+    if head is None:
+        return []
+    ids = [
+        row.id for row in db.query(models.Job.id)
+        .filter(runnable, models.Job.kind == head.kind)
+        .order_by(models.Job.id)
+        .limit(JOB_BATCH_SIZE)
+    ]
+    # The status check in the UPDATE makes the claim safe across processes
+    db.query(models.Job).filter(models.Job.id.in_(ids), runnable).update(
+        {"status": models.JobStatus.RUNNING, "locked_by": worker_id, "locked_at": now},
+        synchronize_session=False,
+    )
+    db.commit()
+    return (
+        db.query(models.Job)
+        .filter(models.Job.locked_by == worker_id, models.Job.status == models.JobStatus.RUNNING)
+        .order_by(models.Job.id)
+        .all()
+    )
+
+
+def _fail(jobs: List[models.Job], exc: Exception):
+    """Requeue `jobs` with exponential backoff, or mark them failed once out of attempts."""
+    for job in jobs:
+        job.attempts += 1
+        job.last_error = repr(exc)[:500]
+        job.locked_by = None
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            job.status = models.JobStatus.FAILED
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = models.JobStatus.QUEUED
+            job.run_after = datetime.utcnow() + timedelta(seconds=2 ** job.attempts)
+
+
+def _done(jobs: List[models.Job]):
+    finished = datetime.utcnow()
+    for job in jobs:
+        job.status = models.JobStatus.DONE
+        job.finished_at = finished
+
+
+def run_once(worker_id: str = "inline", bind: Optional[Engine] = None) -> int:
+    """Claim and process one batch from `bind` (default: the primary). Returns how many jobs were in it.
+
+    Jobs run unscoped: a tenant's jobs are queued in the database holding its rows.
+    """
+    db = SessionLocal(bind=bind or engine)
+    try:
+        batch = _claim(db, worker_id)
+        if not batch:
+            return 0
+        kind = batch[0].kind
+        fn = HANDLERS.get(kind)
+        if fn is None:
+            _fail(batch, LookupError(f"No handler registered for job kind {kind!r}"))
+            db.commit()
+            return len(batch)
+        try:
+            fn(db, [json.loads(job.payload) for job in batch])
+            _done(batch)
+            db.commit()
+            return len(batch)
+        except Exception as exc:
+            db.rollback()
+            if len(batch) == 1:
+                logger.exception("Job %d (%r) failed", batch[0].id, kind)
+                _fail(batch, exc)
+                db.commit()
+                return 1
+            logger.warning("Job batch of %d %r jobs failed, retrying them one at a time", len(batch), kind, exc_info=True)
+        # One bad job must not hold back, or use up the attempts of, the rest of its batch
+        for job in batch:
+            try:
+                fn(db, [json.loads(job.payload)])
+                _done([job])
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                logger.exception("Job %d (%r) failed", job.id, kind)
+                _fail([job], exc)
+                db.commit()
+        return len(batch)
+    finally:
+        db.close()
+
+
+def purge_finished(bind: Optional[Engine] = None):
+    """Drop finished jobs and expired idempotency records, which would otherwise grow forever."""
+    db = SessionLocal(bind=bind or engine)
+    try:
+        db.query(models.Job).filter(
+            models.Job.status == models.JobStatus.DONE,
+            models.Job.finished_at < datetime.utcnow() - timedelta(hours=JOB_RETENTION_HOURS),
+        ).delete(synchronize_session=False)
+        db.query(models.IdempotencyRecord).filter(
+            models.IdempotencyRecord.created_at < datetime.utcnow() - timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _worker_loop(worker_id: str):
+    last_purge = 0.0
+    while not _stop.is_set():
+        try:
+            # Every database with a queue: the primary and each tenant moved out of it
+            binds = all_engines()
+            if sum(run_once(worker_id, bind) for bind in binds):
+                continue
+            if time.monotonic() - last_purge > 60:
+                for bind in binds:
+                    purge_finished(bind)
+                last_purge = time.monotonic()
+        except Exception:
+            logger.exception("Job worker %s crashed while polling", worker_id)
+        _wakeup.wait(JOB_POLL_SECONDS)
+        _wakeup.clear()
+
+
+def start_workers(count: int = JOB_WORKERS):
+    _stop.clear()
+    for i in range(count):
+        worker_id = f"{uuid.uuid4().hex[:8]}-{i}"
+        thread = threading.Thread(target=_worker_loop, args=(worker_id,), name=f"job-worker-{i}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+def stop_workers(timeout: float = 10.0):
+    _stop.set()
+    _wakeup.set()
+    for thread in _threads:
+        thread.join(timeout)
+    _threads.clear()
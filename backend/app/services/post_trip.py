@@ -0,0 +1,110 @@
+from datetime import datetime
+from typing import Iterable, List
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from ..models import models
+from . import distance, jobs, safety
+
+# Follow-up work that used to run inline in the request. Enqueued in the same
+# transaction as the change that triggers it, run by the job workers.
+
+TRIP_COMPLETED = "trip_completed"
+VEHICLE_ROLLUP = "vehicle_rollup"
+TRIP_DELETED = "trip_deleted"
+
+
+@jobs.handler(TRIP_COMPLETED)
+def process_completed_trips(db: Session, payloads: List[dict]):
+    trips = db.query(models.Trip).filter(models.Trip.id.in_({p["trip_id"] for p in payloads})).all()
+    for trip in sorted(trips, key=lambda t: t.completed_at or datetime.min):
+        vehicle = trip.vehicle
+        # 1. Validate the reading; a lower odometer never rolls the vehicle back
+        previous = trip.start_odometer if trip.start_odometer is not None else (vehicle.odometer if vehicle else None)
+        trip.odometer_anomaly = (
+            trip.final_odometer is not None and previous is not None and trip.final_odometer < previous
+        )
+        if vehicle and trip.final_odometer is not None:
+            vehicle.odometer = max(vehicle.odometer or 0.0, trip.final_odometer)
+    db.flush()
+    # 2. Rollups and scores for everything the batch touched
+    refresh_rollups(db, {t.vehicle_id for t in trips if t.vehicle_id})
+    safety.recompute_scores(db, {t.driver_id for t in trips if t.driver_id})
+
+
+@jobs.handler(VEHICLE_ROLLUP)
+def process_vehicle_rollups(db: Session, payloads: List[dict]):
+    refresh_rollups(db, {p["vehicle_id"] for p in payloads})
+
+
+@jobs.handler(TRIP_DELETED)
+def process_deleted_trips(db: Session, payloads: List[dict]):
+    # The trip is gone; recompute from what is left for its vehicle and driver
+    refresh_rollups(db, {p["vehicle_id"] for p in payloads if p.get("vehicle_id")})
+    safety.recompute_scores(db, {p["driver_id"] for p in payloads if p.get("driver_id")})
+
+
+def refresh_rollups(db: Session, vehicle_ids: Iterable[int]):
+    """Recompute per-vehicle totals with grouped aggregates, so reruns are harmless."""
+    vehicle_ids = list(set(vehicle_ids))
+    if not vehicle_ids:
+        return
+    totals = {vid: {"completed_trips": 0, "distance": 0.0, "fuel_liters": 0.0, "fuel_cost": 0.0, "maintenance_cost": 0.0, "route_distance": 0.0} for vid in vehicle_ids}
+
+    # Archived rows still count towards lifetime totals
+    for trip_model in (models.Trip, models.ArchivedTrip):
+        trips = (
+            db.query(
+                trip_model.vehicle_id,
+                func.count(trip_model.id),
+                # Anomalous readings would subtract distance, so they count as zero
+                func.sum(case(
+                    (trip_model.odometer_anomaly.is_(True), 0.0),
+                    else_=trip_model.final_odometer - trip_model.start_odometer,
+                )),
+            )
+            .filter(trip_model.vehicle_id.in_(vehicle_ids), trip_model.status == models.TripStatus.COMPLETED)
+            .group_by(trip_model.vehicle_id)
+        )
+        for vehicle_id, count, odometer_km in trips:
+            totals[vehicle_id]["completed_trips"] += count
+            totals[vehicle_id]["distance"] += max(0.0, odometer_km or 0.0)
+
+        # Route distance between the trip's cities, resolved once per distinct pair
+        routes = (
+            db.query(trip_model.vehicle_id, trip_model.origin, trip_model.destination, func.count(trip_model.id))
+            .filter(trip_model.vehicle_id.in_(vehicle_ids), trip_model.status == models.TripStatus.COMPLETED)
+            .group_by(trip_model.vehicle_id, trip_model.origin, trip_model.destination)
+            .all()
+        )
+        known = distance.distances_km(db, [(o, d) for _, o, d, _ in routes])
+        for vehicle_id, origin, destination, count in routes:
+            km = known.get((distance.normalize(origin), distance.normalize(destination)))
+            totals[vehicle_id]["route_distance"] += (km or 0.0) * count
+
+    for fuel_model in (models.FuelLog, models.ArchivedFuelLog):
+        fuel = (
+            db.query(fuel_model.vehicle_id, func.sum(fuel_model.liters), func.sum(fuel_model.cost))
+            .filter(fuel_model.vehicle_id.in_(vehicle_ids))
+            .group_by(fuel_model.vehicle_id)
+        )
+        for vehicle_id, liters, cost in fuel:
+            totals[vehicle_id]["fuel_liters"] += liters or 0.0
+            totals[vehicle_id]["fuel_cost"] += cost or 0.0
+
+    for maintenance_model in (models.MaintenanceLog, models.ArchivedMaintenanceLog):
+        maintenance = (
+            db.query(maintenance_model.vehicle_id, func.sum(maintenance_model.cost))
+            .filter(maintenance_model.vehicle_id.in_(vehicle_ids))
+            .group_by(maintenance_model.vehicle_id)
+        )
+        for vehicle_id, cost in maintenance:
+            totals[vehicle_id]["maintenance_cost"] += cost or 0.0
+
+    now = datetime.utcnow()
+    existing = {r.vehicle_id: r for r in db.query(models.VehicleRollup).filter(models.VehicleRollup.vehicle_id.in_(vehicle_ids))}
+    for vehicle_id, values in totals.items():
+        rollup = existing.get(vehicle_id) or models.VehicleRollup(vehicle_id=vehicle_id)
+        for key, value in values.items():
+            setattr(rollup, key, value)
+        rollup.updated_at = now
+        db.add(rollup)
@@ -0,0 +1,88 @@
+import enum
+from datetime import date, datetime
+from typing import Dict, List
+from sqlalchemy import Date, DateTime, Enum, inspect, select
+from sqlalchemy.orm import Session
+from ..db import tenancy
+from . import distance
+
+
+class Fieldset:
+    """What a sparse request asked for: top-level fields plus embedded relations and their fields.
+
+    Both lists always start with "id".
+    """
+
+    def __init__(self, columns: List[str], includes: Dict[str, List[str]]):
+        self.columns = columns
+        self.includes = includes
+
+
+# Response fields computed from other columns rather than selected
+COMPUTED = {
+    "distance_km": ("origin", "destination"),
+    "eta_hours": ("origin", "destination"),
+}
+
+
+def _encoder(column_type):
+    """JSON-ready conversion for a column, or None when the DB value can be used as is."""
+    if isinstance(column_type, Enum):
+        return lambda v: v.value if isinstance(v, enum.Enum) else v
+    if isinstance(column_type, (Date, DateTime)):
+        return lambda v: v.isoformat() if isinstance(v, (date, datetime)) else v
+    return None
+
+
+def rows(db: Session, model, fieldset: Fieldset, *conditions) -> List[dict]:
+    """Select only the requested columns (and joined relation columns) and build plain dicts.
+
+    No ORM objects and no response-model validation: the dicts are ready to
+    be returned as JSON, shaped like the full schema minus what wasn't asked for.
+    """
+    table = model.__table__
+    computed = [name for name in fieldset.columns if name in COMPUTED]
+    selected = [name for name in fieldset.columns if name not in COMPUTED]
+    for name in computed:
+        selected += [source for source in COMPUTED[name] if source not in selected]
+
+    columns = [table.c[name] for name in selected]
+    layout = [(None, name, _encoder(table.c[name].type)) for name in selected]
+    source = table
+    relationships = inspect(model).relationships
+    for relation, fields in fieldset.includes.items():
+        target = relationships[relation].mapper.local_table.alias(relation)
+        (local,) = relationships[relation].local_columns
+        source = source.outerjoin(target, table.c[local.name] == target.c.id)
+        columns += [target.c[name] for name in fields]
+        layout += [(relation, name, _encoder(target.c[name].type)) for name in fields]
+
+    # Core selects skip the ORM's tenant filter; relations are reached through an already-filtered row
+    result = db.execute(select(*columns).select_from(source).where(*conditions, *tenancy.filters(db, table)))
+    top = [(i, name, encode) for i, (relation, name, encode) in enumerate(layout) if relation is None]
+    nested = {
+        relation: [(i, name, encode) for i, (owner, name, encode) in enumerate(layout) if owner == relation]
+        for relation in fieldset.includes
+    }
+    items = []
+    for row in result:
+        item = {name: encode(row[i]) if encode else row[i] for i, name, encode in top}
+        for relation, parts in nested.items():
+            # The relation's id comes first; NULL means the outer join found nothing
+            item[relation] = None if row[parts[0][0]] is None else {
+                name: encode(row[i]) if encode else row[i] for i, name, encode in parts
+            }
+        items.append(item)
+
+    if computed:
+        known = distance.distances_km(db, [(item["origin"], item["destination"]) for item in items])
+        for item in items:
+            km = known.get((distance.normalize(item["origin"]), distance.normalize(item["destination"])))
+            if "distance_km" in computed:
+                item["distance_km"] = km
+            if "eta_hours" in computed:
+                item["eta_hours"] = distance.eta_hours(km)
+            for name in ("origin", "destination"):
+                if name not in fieldset.columns:
+                    del item[name]
+    return items
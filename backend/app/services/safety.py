@@ -0,0 +1,146 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+import numpy as np
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.orm import Session
+from ..models import models
+
+# Score = 100 minus these penalties, clipped to [0, 100]
+CANCELLATION_PENALTY = 30.0   # times the share of finished trips that were cancelled
+OVERLOAD_PENALTY = 20.0       # at full scale once average load reaches capacity
+OVERLOAD_START = 0.8          # average load/capacity ratio where the penalty starts
+ANOMALY_PENALTY = 5.0         # per odometer anomaly
+ANOMALY_PENALTY_CAP = 25.0
+EXPIRED_LICENSE_PENALTY = 25.0
+EXPIRING_LICENSE_PENALTY = 5.0
+EXPIRING_WITHIN_DAYS = 30
+
+
+def _trip_aggregates(db: Session, trip_model, driver_filter):
+    """One grouped query per trip table: counts, anomalies and summed load ratio per driver."""
+    load_ratio = trip_model.cargo_weight / models.Vehicle.capacity
+    query = (
+        select(
+            trip_model.driver_id,
+            func.sum(case((trip_model.status.in_((models.TripStatus.COMPLETED, models.TripStatus.CANCELLED)), 1), else_=0)),
+            func.sum(case((trip_model.status == models.TripStatus.CANCELLED, 1), else_=0)),
+            func.sum(case((trip_model.odometer_anomaly.is_(True), 1), else_=0)),
+            func.sum(case((models.Vehicle.capacity > 0, load_ratio), else_=None)),
+            func.count(case((models.Vehicle.capacity > 0, 1), else_=None)),
+        )
+        .outerjoin(models.Vehicle, models.Vehicle.id == trip_model.vehicle_id)
+        .where(trip_model.driver_id.isnot(None))
+        .group_by(trip_model.driver_id)
+    )
+    if driver_filter is not None:
+        query = query.where(trip_model.driver_id.in_(driver_filter))
+    return db.execute(query).all()
+
+
+def score_drivers(db: Session, driver_filter=None, today: Optional[date] = None) -> int:
+    """Recompute safety scores for the drivers matched by `driver_filter` (all when None).
+
+    `driver_filter` may be a list of ids or a SELECT of ids. Aggregates come
+    from grouped SQL, scoring is vectorized and the results are written back
+    with a single executemany UPDATE. Returns the number of drivers scored.
+    """
+    today = today or date.today()
+    driver_query = select(models.Driver.id, models.Driver.license_expiry).order_by(models.Driver.id)
+    if driver_filter is not None:
+        driver_query = driver_query.where(models.Driver.id.in_(driver_filter))
+    drivers = db.execute(driver_query).all()
+    if not drivers:
+        return 0
+    ids = np.fromiter((row[0] for row in drivers), dtype=np.int64, count=len(drivers))
+    days_left = np.fromiter(
+        ((row[1] - today).days if row[1] else 10 ** 6 for row in drivers), dtype=np.int64, count=len(drivers)
+    )
+
+    finished = np.zeros(len(ids))
+    cancelled = np.zeros(len(ids))
+    anomalies = np.zeros(len(ids))
+    load_sum = np.zeros(len(ids))
+    load_count = np.zeros(len(ids))
+    # Archived trips are part of a driver's history too
+    for trip_model in (models.Trip, models.ArchivedTrip):
+        rows = _trip_aggregates(db, trip_model, driver_filter)
+        if not rows:
+            continue
+        agg = np.array([[value or 0 for value in row] for row in rows], dtype=np.float64)
+        positions = np.searchsorted(ids, agg[:, 0].astype(np.int64))
+        known = (positions < len(ids)) & (ids[np.minimum(positions, len(ids) - 1)] == agg[:, 0])
+        positions, agg = positions[known], agg[known]
+        finished[positions] += agg[:, 1]
+        cancelled[positions] += agg[:, 2]
+        anomalies[positions] += agg[:, 3]
+        load_sum[positions] += agg[:, 4]
+        load_count[positions] += agg[:, 5]
+
+    cancel_rate = np.divide(cancelled, finished, out=np.zeros_like(cancelled), where=finished > 0)
+    avg_load = np.divide(load_sum, load_count, out=np.zeros_like(load_sum), where=load_count > 0)
+    overload = np.clip((avg_load - OVERLOAD_START) / (1.0 - OVERLOAD_START), 0.0, 1.0)
+    license_penalty = np.where(
+        days_left < 0,
+        EXPIRED_LICENSE_PENALTY,
+        np.where(days_left <= EXPIRING_WITHIN_DAYS, EXPIRING_LICENSE_PENALTY, 0.0),
+    )
+    scores = 100.0 - (
+        CANCELLATION_PENALTY * cancel_rate
+        + OVERLOAD_PENALTY * overload
+        + np.minimum(ANOMALY_PENALTY * anomalies, ANOMALY_PENALTY_CAP)
+        + license_penalty
+    )
+    scores = np.round(np.clip(scores, 0.0, 100.0), 1)
+
+    db.execute(
+        update(models.Driver),
+        [{"id": int(i), "safety_score": float(s)} for i, s in zip(ids, scores)],
+    )
+    return len(ids)
+
+
+def recompute_scores(db: Session, driver_ids: Iterable[int]):
+    """Rescore a handful of drivers, e.g. the ones in a batch of completed trips."""
+    driver_ids = sorted(set(driver_ids))
+    if driver_ids:
+        score_drivers(db, driver_ids)
+
+
+def run(db: Session, incremental: bool = True) -> models.SafetyScoreRun:
+    """Full or incremental engine pass, recorded in safety_score_runs.
+
+    Incremental runs only rescore drivers with trips created or completed
+    since the last run, plus drivers whose license crossed a penalty
+    threshold in the meantime.
+    """
+    last = (
+        db.query(models.SafetyScoreRun)
+        .filter(models.SafetyScoreRun.finished_at.isnot(None))
+        .order_by(models.SafetyScoreRun.started_at.desc())
+        .first()
+    )
+    current = models.SafetyScoreRun(incremental=bool(incremental and last), started_at=datetime.utcnow())
+    db.add(current)
+    db.flush()
+
+    driver_filter = None
+    if current.incremental:
+        since = last.started_at
+        today = date.today()
+        window = timedelta(days=EXPIRING_WITHIN_DAYS)
+        driver_filter = (
+            select(models.Trip.driver_id)
+            .where(or_(models.Trip.created_at >= since, models.Trip.completed_at >= since))
+            .union(
+                select(models.Driver.id).where(
+                    or_(
+                        and_(models.Driver.license_expiry >= since.date(), models.Driver.license_expiry < today),
+                        and_(models.Driver.license_expiry >= since.date() + window, models.Driver.license_expiry <= today + window),
+                    )
+                )
+            )
+        )
+    current.drivers_scored = score_drivers(db, driver_filter)
+    current.finished_at = datetime.utcnow()
+    db.commit()
+    return current
@@ -0,0 +1,212 @@
+from typing import Dict, List
+from sqlalchemy import and_, bindparam, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from ..db import tenancy
+from ..models import models
+
+# Typo-tolerant matching: trigrams used to find candidates, and the share of
+# the query's trigrams a candidate must contain to be returned
+FUZZY_TRIGRAMS = 6
+FUZZY_MIN_OVERLAP = 0.6
+# Trigrams found in more rows than this ("flt", "ver") do not narrow anything down
+FUZZY_MAX_DOCS = 5000
+# Each tenant owns a rowid range of the SQLite index, so a MATCH restricted to
+# that range only walks the tenant's own entries
+TENANT_ROWID_SPAN = 2 ** 40
+
+# Searchable text per kind. On SQLite the FTS rowid is
+# tenant_id * TENANT_ROWID_SPAN + id * 2 + tag so that a trigger can find a
+# row's entry through the rowid b-tree instead of a scan.
+SOURCES = {
+    "vehicles": {"table": "vehicles", "model": models.Vehicle, "tag": 0, "columns": "name, plate", "prefix": (("name", str.title), ("plate", str.upper)), "terms": "coalesce({p}name, '') || ' ' || coalesce({p}plate, '')"},
+    "drivers": {"table": "drivers", "model": models.Driver, "tag": 1, "columns": "name, license_number", "prefix": (("name", str.title), ("license_number", str.upper)), "terms": "coalesce({p}name, '') || ' ' || coalesce({p}license_number, '')"},
+}
+
+
+def _rowid(prefix: str, tag: int) -> str:
+    return f"{prefix}tenant_id * {TENANT_ROWID_SPAN} + {prefix}id * 2 + {tag}"
+
+
+def _sqlite_ddl() -> List[str]:
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(terms, tokenize='trigram')",
+        # Per-trigram document counts, used to skip trigrams shared by most rows
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_vocab USING fts5vocab(search_index, 'row')",
+    ]
+    for source in SOURCES.values():
+        table, tag = source["table"], source["tag"]
+        new_terms, old_terms = source["terms"].format(p="new."), source["terms"].format(p="")
+        new_rowid, old_rowid = _rowid("new.", tag), _rowid("old.", tag)
+        statements += [
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO search_index(rowid, terms) VALUES ({new_rowid}, {new_terms});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {source["columns"]}, tenant_id ON {table} BEGIN
+                DELETE FROM search_index WHERE rowid = {old_rowid};
+                INSERT INTO search_index(rowid, terms) VALUES ({new_rowid}, {new_terms});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM search_index WHERE rowid = {old_rowid};
+            END""",
+            # Backfill rows written before the index existed
+            f"""INSERT INTO search_index(rowid, terms)
+                SELECT {_rowid("", tag)}, {old_terms} FROM {table}
+                WHERE {_rowid("", tag)} NOT IN (SELECT rowid FROM search_index)""",
+        ]
+    return statements
+
+
+def _sqlite_outdated(connection) -> List[str]:
+    """Statements dropping an index laid out before tenants (rowid = id * 2 + tag), so it is rebuilt."""
+    found = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'vehicles_search_insert'")).scalar()
+    if found is None or "tenant_id" in found:
+        return []
+    statements = ["DELETE FROM search_index"]
+    for source in SOURCES.values():
+        statements += [f"DROP TRIGGER IF EXISTS {source['table']}_search_{event}" for event in ("insert", "update", "delete")]
+    return statements
+
+
+def _postgres_ddl() -> List[str]:
+    statements = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+    for source in SOURCES.values():
+        table = source["table"]
+        statements.append(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search_trgm ON {table} "
+            f"USING gin (({source['terms'].format(p='')}) gin_trgm_ops)"
+        )
+    return statements
+
+
+def install(engine: Engine):
+    """Create the search index and keep it in sync with vehicles and drivers."""
+    if engine.dialect.name == "sqlite":
+        statements = _sqlite_ddl()
+    elif engine.dialect.name == "postgresql":
+        statements = _postgres_ddl()
+    else:
+        return
+    with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            statements = _sqlite_outdated(connection) + statements
+        for statement in statements:
+            connection.execute(text(statement))
+
+
+def _fts_quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _trigrams(value: str) -> set:
+    value = value.lower()
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def _sqlite_rank(db: Session, query: str, tag: int, limit: int) -> List[int]:
+    ids: List[int] = []
+    tenant_id = tenancy.session_tenant(db)
+    # The caller's own rowid range, or every tenant's for unscoped sessions
+    bounds = (
+        {"low": tenant_id * TENANT_ROWID_SPAN, "high": (tenant_id + 1) * TENANT_ROWID_SPAN}
+        if tenant_id is not None else {"low": 0, "high": 2 ** 62}
+    )
+
+    def add(rowid: int):
+        row_id = rowid % TENANT_ROWID_SPAN // 2
+        if len(ids) < limit and row_id not in ids:
+            ids.append(row_id)
+
+    # 1. Substring (and therefore prefix) matches, best bm25 first
+    rows = db.execute(
+        text(
+            "SELECT rowid FROM search_index WHERE search_index MATCH :match "
+            "AND rowid >= :low AND rowid < :high AND rowid % 2 = :tag "
+            "ORDER BY bm25(search_index) LIMIT :limit"
+        ),
+        {"match": _fts_quote(query), "tag": tag, "limit": limit, **bounds},
+    )
+    for (rowid,) in rows:
+        add(rowid)
+    if len(ids) >= limit:
+        return ids
+
+    # 2. Typo tolerance: candidates share the query's rarest trigrams, then
+    #    rank by the fraction of all query trigrams they contain
+    wanted = _trigrams(query)
+    counts = db.execute(
+        text("SELECT term, doc FROM search_vocab WHERE term IN :terms").bindparams(
+            bindparam("terms", expanding=True)
+        ),
+        {"terms": sorted(wanted)},
+    ).all()
+    rarest = [term for term, doc in sorted(counts, key=lambda row: row[1]) if doc <= FUZZY_MAX_DOCS][:FUZZY_TRIGRAMS]
+    if not rarest:
+        return ids
+    candidates = db.execute(
+        text(
+            "SELECT rowid, terms FROM search_index WHERE search_index MATCH :match "
+            "AND rowid >= :low AND rowid < :high AND rowid % 2 = :tag "
+            "ORDER BY bm25(search_index) LIMIT :candidates"
+        ),
+        {"match": " OR ".join(_fts_quote(t) for t in rarest), "tag": tag, "candidates": limit * 10, **bounds},
+    ).all()
+    scored = []
+    for position, (rowid, terms) in enumerate(candidates):
+        overlap = len(wanted & _trigrams(terms)) / len(wanted)
+        if overlap >= FUZZY_MIN_OVERLAP:
+            scored.append((-overlap, position, rowid))
+    for _, _, rowid in sorted(scored):
+        add(rowid)
+    return ids
+
+
+def _postgres_rank(db: Session, query: str, source: dict, limit: int) -> List[int]:
+    terms = source["terms"].format(p="")
+    tenant_id = tenancy.session_tenant(db)
+    rows = db.execute(
+        text(
+            f"SELECT id FROM {source['table']} "
+            f"WHERE (:tenant IS NULL OR tenant_id = :tenant) AND ({terms} ILIKE :pattern OR :query <% {terms}) "
+            f"ORDER BY ({terms} ILIKE :pattern) DESC, word_similarity(:query, {terms}) DESC "
+            f"LIMIT :limit"
+        ),
+        {"query": query, "pattern": "%" + query.replace("%", "").replace("_", "") + "%", "limit": limit, "tenant": tenant_id},
+    )
+    return [row[0] for row in rows]
+
+
+def _prefix_rank(db: Session, query: str, source: dict, limit: int) -> List[int]:
+    """Queries too short for trigrams: range scans on the indexed columns."""
+    model = source["model"]
+    ranges = []
+    for name, normalize in source["prefix"]:
+        column, start = getattr(model, name), normalize(query)
+        ranges.append(and_(column >= start, column < start + "\uffff"))
+    return [row.id for row in db.query(model.id).filter(or_(*ranges)).limit(limit)]
+
+
+def search(db: Session, query: str, kinds: List[str], limit: int) -> Dict[str, list]:
+    """Ranked vehicles and drivers whose name, plate or license matches `query`."""
+    results = {}
+    dialect = db.get_bind().dialect.name
+    for kind in kinds:
+        source = SOURCES[kind]
+        if len(query) < 3:
+            ids = _prefix_rank(db, query, source, limit)
+        elif dialect == "sqlite":
+            ids = _sqlite_rank(db, query, source["tag"], limit)
+        elif dialect == "postgresql":
+            ids = _postgres_rank(db, query, source, limit)
+        else:
+            model = source["model"]
+            column = model.plate if kind == "vehicles" else model.license_number
+            ids = [
+                row.id for row in db.query(model.id)
+                .filter(model.name.ilike(f"%{query}%") | column.ilike(f"%{query}%"))
+                .limit(limit)
+            ]
+        model = source["model"]
+        by_id = {row.id: row for row in db.query(model).filter(model.id.in_(ids))} if ids else {}
+        results[kind] = [by_id[i] for i in ids if i in by_id]
+    return results
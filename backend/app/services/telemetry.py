@@ -0,0 +1,237 @@
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import and_, bindparam, case, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..core.config import (
+    TELEMETRY_HOUR_RETENTION_DAYS,
+    TELEMETRY_MINUTE_RETENTION_DAYS,
+    TELEMETRY_RAW_RETENTION_DAYS,
+)
+from ..models import models
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+VALUES = ("odometer", "latitude", "longitude", "fuel_level")
+
+# Compact wire format: little-endian fixed-size records, NaN for a missing reading
+RECORD = np.dtype([
+    ("vehicle_id", "<u4"),
+    ("ts", "<f8"),          # epoch seconds, UTC
+    ("odometer", "<f8"),
+    ("latitude", "<f4"),
+    ("longitude", "<f4"),
+    ("fuel_level", "<f4"),
+])
+BINARY_TYPES = ("application/octet-stream", "application/vnd.fleetnova.telemetry")
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json")
+
+Batch = Dict[str, np.ndarray]
+
+
+def _epoch(value) -> float:
+    """Epoch seconds from a number, an ISO 8601 string or a datetime; naive times are UTC."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def _reading(row: dict, name: str) -> float:
+    value = row.get(name)
+    return float("nan") if value is None else float(value)
+
+
+def parse(body: bytes, content_type: str) -> Batch:
+    """Decode an NDJSON or binary request body into column arrays. Raises ValueError on bad input."""
+    if content_type in BINARY_TYPES:
+        if len(body) % RECORD.itemsize:
+            raise ValueError(f"Binary telemetry must be a whole number of {RECORD.itemsize}-byte records")
+        records = np.frombuffer(body, dtype=RECORD)
+        batch = {"vehicle_id": records["vehicle_id"].astype(np.int64), "ts": records["ts"].astype(np.float64)}
+        batch.update({name: records[name].astype(np.float64) for name in VALUES})
+        return batch
+    if content_type in NDJSON_TYPES:
+        try:
+            rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+            count = len(rows)
+            batch = {
+                "vehicle_id": np.fromiter((int(r["vehicle_id"]) for r in rows), dtype=np.int64, count=count),
+                "ts": np.fromiter((_epoch(r["ts"]) for r in rows), dtype=np.float64, count=count),
+            }
+            batch.update({
+                name: np.fromiter((_reading(r, name) for r in rows), dtype=np.float64, count=count)
+                for name in VALUES
+            })
+        except (KeyError, TypeError, AttributeError) as exc:
+            raise ValueError(f"Malformed telemetry line: {exc!r}")
+        return batch
+    raise LookupError(content_type)
+
+
+def _nullable(values: np.ndarray) -> list:
+    return [None if v != v else v for v in values.tolist()]
+
+
+def _upsert(dialect: str):
+    """Merge a batch's bucket aggregates into whatever earlier batches left in the same buckets."""
+    table = models.TelemetryRollup.__table__
+    if dialect == "sqlite":
+        statement = sqlite.insert(table)
+    elif dialect == "postgresql":
+        statement = postgresql.insert(table)
+    else:
+        raise NotImplementedError(f"Telemetry rollups need SQLite or PostgreSQL, not {dialect}")
+    old, new = table.c, statement.excluded
+
+    def lower(a, b):
+        return case((a.is_(None), b), (b.is_(None), a), (b < a, b), else_=a)
+
+    def higher(a, b):
+        return case((a.is_(None), b), (b.is_(None), a), (b > a, b), else_=a)
+
+    newer = and_(new.located_at.isnot(None), or_(old.located_at.is_(None), new.located_at >= old.located_at))
+    return statement.on_conflict_do_update(
+        index_elements=[old.resolution, old.vehicle_id, old.bucket_start],
+        set_={
+            "points": old.points + new.points,
+            "odometer_min": lower(old.odometer_min, new.odometer_min),
+            "odometer_max": higher(old.odometer_max, new.odometer_max),
+            "fuel_level_min": lower(old.fuel_level_min, new.fuel_level_min),
+            "fuel_level_max": higher(old.fuel_level_max, new.fuel_level_max),
+            "fuel_level_sum": old.fuel_level_sum + new.fuel_level_sum,
+            "fuel_level_count": old.fuel_level_count + new.fuel_level_count,
+            "latitude": case((newer, new.latitude), else_=old.latitude),
+            "longitude": case((newer, new.longitude), else_=old.longitude),
+            "located_at": case((newer, new.located_at), else_=old.located_at),
+        },
+    )
+
+
+def _bucket_rows(batch: Batch, width: int) -> List[dict]:
+    """Aggregate a batch sorted by (vehicle_id, ts) into one row per vehicle and bucket."""
+    vehicle_id, ts = batch["vehicle_id"], batch["ts"]
+    count = len(ts)
+    bucket = (np.floor(ts / width) * width).astype(np.int64)
+    change = np.ones(count, dtype=bool)
+    change[1:] = (vehicle_id[1:] != vehicle_id[:-1]) | (bucket[1:] != bucket[:-1])
+    starts = np.flatnonzero(change)
+
+    odometer, fuel = batch["odometer"], batch["fuel_level"]
+    has_fuel = ~np.isnan(fuel)
+    located = ~np.isnan(batch["latitude"]) & ~np.isnan(batch["longitude"])
+    # Rows are in time order within a bucket, so the highest located index is the latest fix
+    last_fix = np.maximum.reduceat(np.where(located, np.arange(count), -1), starts)
+    safe_fix = np.maximum(last_fix, 0)
+    no_fix = last_fix < 0
+
+    columns = {
+        "vehicle_id": vehicle_id[starts].tolist(),
+        "bucket_start": bucket[starts].tolist(),
+        "points": np.diff(np.append(starts, count)).tolist(),
+        "odometer_min": _nullable(np.fmin.reduceat(odometer, starts)),
+        "odometer_max": _nullable(np.fmax.reduceat(odometer, starts)),
+        "fuel_level_min": _nullable(np.fmin.reduceat(fuel, starts)),
+        "fuel_level_max": _nullable(np.fmax.reduceat(fuel, starts)),
+        "fuel_level_sum": np.add.reduceat(np.where(has_fuel, fuel, 0.0), starts).tolist(),
+        "fuel_level_count": np.add.reduceat(has_fuel.astype(np.int64), starts).tolist(),
+        "latitude": _nullable(np.where(no_fix, np.nan, batch["latitude"][safe_fix])),
+        "longitude": _nullable(np.where(no_fix, np.nan, batch["longitude"][safe_fix])),
+        "located_at": _nullable(np.where(no_fix, np.nan, ts[safe_fix])),
+    }
+    names = list(columns)
+    return [
+        dict(zip(names, values), resolution=width)
+        for values in zip(*(columns[name] for name in names))
+    ]
+
+
+def ingest(db: Session, batch: Batch) -> Tuple[int, int]:
+    """Append a batch of points, fold it into the rollups and advance vehicle odometers.
+
+    Everything happens in one transaction. Points for unknown vehicles or
+    without a usable timestamp are dropped. Returns (accepted, rejected).
+    """
+    total = len(batch["ts"])
+    if not total:
+        return 0, 0
+    # 1. Drop what can't be stored
+    known = np.array(
+        [row.id for row in db.query(models.Vehicle.id).filter(models.Vehicle.id.in_(np.unique(batch["vehicle_id"]).tolist()))],
+        dtype=np.int64,
+    )
+    keep = np.isin(batch["vehicle_id"], known) & np.isfinite(batch["ts"])
+    order = np.lexsort((batch["ts"], batch["vehicle_id"]))
+    order = order[keep[order]]
+    batch = {name: column[order] for name, column in batch.items()}
+    accepted = len(order)
+    if not accepted:
+        return 0, total
+
+    # 2. Raw points, one executemany
+    columns = {"vehicle_id": batch["vehicle_id"].tolist(), "ts": batch["ts"].tolist()}
+    columns.update({name: _nullable(batch[name]) for name in VALUES})
+    names = list(columns)
+    db.execute(
+        insert(models.TelemetryPoint.__table__),
+        [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))],
+    )
+
+    # 3. Minute, hour and day buckets
+    rows = [row for width in RESOLUTIONS.values() for row in _bucket_rows(batch, width)]
+    db.execute(_upsert(db.get_bind().dialect.name), rows)
+
+    # 4. Odometers only move forward
+    vehicle_starts = np.flatnonzero(np.r_[True, batch["vehicle_id"][1:] != batch["vehicle_id"][:-1]])
+    readings = np.fmax.reduceat(batch["odometer"], vehicle_starts)
+    updates = [
+        {"vehicle": vid, "reading": reading}
+        for vid, reading in zip(batch["vehicle_id"][vehicle_starts].tolist(), readings.tolist())
+        if reading == reading
+    ]
+    if updates:
+        vehicles = models.Vehicle.__table__
+        reading = bindparam("reading")
+        db.execute(
+            update(vehicles)
+            .where(vehicles.c.id == bindparam("vehicle"))
+            .values(odometer=case((or_(vehicles.c.odometer.is_(None), vehicles.c.odometer < reading), reading), else_=vehicles.c.odometer)),
+            updates,
+        )
+    db.commit()
+    return accepted, total - accepted
+
+
+def buckets(db: Session, vehicle_id: int, resolution: str, start: Optional[datetime], end: Optional[datetime]) -> List[models.TelemetryRollup]:
+    query = db.query(models.TelemetryRollup).filter(
+        models.TelemetryRollup.resolution == RESOLUTIONS[resolution],
+        models.TelemetryRollup.vehicle_id == vehicle_id,
+    )
+    if start:
+        query = query.filter(models.TelemetryRollup.bucket_start >= _epoch(start))
+    if end:
+        query = query.filter(models.TelemetryRollup.bucket_start < _epoch(end))
+    return query.order_by(models.TelemetryRollup.bucket_start).all()
+
+
+def apply_retention(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Downsample by age: raw points, then minute and hour buckets expire; day buckets stay."""
+    now = now or datetime.now(timezone.utc)
+    deleted = {}
+    # By device timestamp, not arrival order: a backlog uploaded late is old data
+    raw_cutoff = (now - timedelta(days=TELEMETRY_RAW_RETENTION_DAYS)).timestamp()
+    deleted["points"] = db.query(models.TelemetryPoint).filter(
+        models.TelemetryPoint.ts < raw_cutoff
+    ).delete(synchronize_session=False)
+    for name, days in (("minute", TELEMETRY_MINUTE_RETENTION_DAYS), ("hour", TELEMETRY_HOUR_RETENTION_DAYS)):
+        cutoff = int((now - timedelta(days=days)).timestamp())
+        deleted[name] = db.query(models.TelemetryRollup).filter(
+            models.TelemetryRollup.resolution == RESOLUTIONS[name],
+            models.TelemetryRollup.bucket_start < cutoff,
+        ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional
+from sqlalchemy import create_engine, delete, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from ..db import tenancy, upgrade
+from ..db.session import Base, _connect_args, engine, forget_tenant, tenant_engine_setup
+from ..models import models
+from . import archive, distance
+from . import search as search_index
+
+COPY_CHUNK_ROWS = 5000
+
+# Not tenant-scoped themselves but owned through a vehicle, so they move with it
+VEHICLE_OWNED = (models.VehicleRollup, models.TelemetryRollup, models.TelemetryPoint)
+
+
+def prepare_database(bind: Engine):
+    """Everything a fresh or older database needs before the API uses it."""
+    Base.metadata.create_all(bind=bind)
+    upgrade.add_missing_columns(bind)
+    upgrade.rebuild_autoincrement(bind)
+    upgrade.sync_indexes(bind)
+    tenancy.install(bind)
+    archive.install(bind)
+    search_index.install(bind)
+    distance.install(bind)
+
+
+tenant_engine_setup.append(prepare_database)
+
+
+def create(db: Session, slug: str, name: str, database_url: Optional[str] = None) -> models.Tenant:
+    tenant = models.Tenant(slug=slug, name=name, database_url=database_url)
+    db.add(tenant)
+    db.commit()
+    db.refresh(tenant)
+    return tenant
+
+
+def _plan(tenant_id: int) -> List[tuple]:
+    """(table, condition) for every row the tenant owns, parents before children.
+
+    Vehicle-owned rows come last so that, deleting in reverse, they go while
+    the vehicles that select them still exist.
+    """
+    plan = [
+        (table, table.c.tenant_id == tenant_id)
+        for table in Base.metadata.sorted_tables
+        if table.name != "users" and "tenant_id" in table.c
+    ]
+    vehicle_ids = select(models.Vehicle.id).where(models.Vehicle.tenant_id == tenant_id)
+    plan += [(model.__table__, model.vehicle_id.in_(vehicle_ids)) for model in VEHICLE_OWNED]
+    return plan
+
+
+def move(db: Session, slug: str, database_url: str) -> Dict[str, int]:
+    """Copy a tenant's rows into their own database, route the tenant there and
+    delete the originals. Returns rows moved per table.
+
+    Run it in a maintenance window: writes made to the tenant while it copies
+    are lost, and API workers keep using the old routing for up to
+    FLEETNOVA_TENANT_CACHE_SECONDS.
+    """
+    tenant = db.query(models.Tenant).filter(models.Tenant.slug == slug).first()
+    if tenant is None:
+        raise LookupError(f"No tenant {slug!r}")
+    if tenant.database_url:
+        raise ValueError(f"Tenant {slug!r} already lives in {tenant.database_url}")
+
+    target = create_engine(database_url, connect_args=_connect_args(database_url))
+    prepare_database(target)
+    plan = _plan(tenant.id)
+    moved = {}
+    try:
+        # 1. Copy, all in one transaction on the target
+        with engine.connect() as source, target.begin() as destination:
+            tenants_table = models.Tenant.__table__
+            # A fresh database seeds the default tenant, which may be the one moving
+            destination.execute(delete(tenants_table).where(tenants_table.c.id == tenant.id))
+            destination.execute(insert(tenants_table), [{"id": tenant.id, "slug": tenant.slug, "name": tenant.name}])
+            for table, condition in plan:
+                moved[table.name] = 0
+                result = source.execution_options(stream_results=True).execute(select(table).where(condition)).mappings()
+                while True:
+                    rows = result.fetchmany(COPY_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    destination.execute(insert(table), [dict(row) for row in rows])
+                    moved[table.name] += len(rows)
+    finally:
+        target.dispose()
+
+    # 2. Route to the new database and drop the originals, children first
+    for table, condition in reversed(plan):
+        db.execute(delete(table).where(condition))
+    tenant.database_url = database_url
+    db.commit()
+    forget_tenant(tenant.id)
+    return moved
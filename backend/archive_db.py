@@ -0,0 +1,54 @@
+import argparse
+from datetime import date
+from app.db.session import SessionLocal, all_engines, engine, open_tenant_engines
+from app.services import archive, tenants
+
+def main():
+    parser = argparse.ArgumentParser(description="Move finished trips and old logs between hot and archive tables.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    archive_cmd = sub.add_parser("archive", help="Move finished rows older than --days into the archive")
+    archive_cmd.add_argument("--days", type=int, default=archive.ARCHIVE_AFTER_DAYS)
+    archive_cmd.add_argument("--kind", choices=list(archive.TIERS), action="append")
+
+    restore_cmd = sub.add_parser("restore", help="Move archived rows in a date range back into the hot tables")
+    restore_cmd.add_argument("--start", type=date.fromisoformat)
+    restore_cmd.add_argument("--end", type=date.fromisoformat)
+    restore_cmd.add_argument("--kind", choices=list(archive.TIERS), action="append")
+
+    sub.add_parser("verify", help="Check that every row lives in exactly one tier")
+
+    args = parser.parse_args()
+    tenants.prepare_database(engine)
+    open_tenant_engines()
+    healthy = True
+    # The primary, then each tenant that has its own database
+    for bind in all_engines():
+        print(f"== {bind.url}")
+        healthy = run(args, SessionLocal(bind=bind)) and healthy
+    if args.command == "verify":
+        print("OK" if healthy else "PROBLEMS FOUND")
+        if not healthy:
+            raise SystemExit(1)
+
+def run(args, db) -> bool:
+    try:
+        if args.command == "archive":
+            for kind, count in archive.archive_old_rows(db, args.days, args.kind).items():
+                print(f"{kind}: archived {count} rows")
+        elif args.command == "restore":
+            for kind, count in archive.restore_rows(db, args.start, args.end, args.kind).items():
+                print(f"{kind}: restored {count} rows")
+        else:
+            healthy = True
+            for kind, entry in archive.verify(db).items():
+                print(f"{kind}: " + ", ".join(f"{k}={v}" for k, v in entry.items()))
+                if entry["in_both_tiers"] or entry.get("unfinished_archived"):
+                    healthy = False
+            return healthy
+        return True
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
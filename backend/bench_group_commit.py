@@ -0,0 +1,100 @@
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.group_commit import GroupCommitWriter
+from app.db.session import Base
+from app.models import models
+
+# Compares fuel-log write throughput with a commit per request against the
+# group-commit writer, on a scratch SQLite file with the same journal and
+# synchronous settings in both runs. Every write is durable before its caller
+# gets an answer either way.
+
+def fuel_write(vehicle_id):
+    def write(db):
+        vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == vehicle_id).first()
+        log = models.FuelLog(vehicle_id=vehicle.id, liters=40.0, cost=60.0, date=date.today())
+        db.add(log)
+        db.flush()
+        return log.id
+    return write
+
+def setup(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    vehicle = models.Vehicle(name="Bench", plate="BENCH-1", vehicle_type=models.VehicleType.TRUCK, capacity=1000, acquisition_cost=1)
+    db.add(vehicle)
+    db.commit()
+    vehicle_id = vehicle.id
+    db.close()
+    return engine, vehicle_id
+
+def run_threads(threads, writes, fn):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        for _ in range(writes):
+            start = time.perf_counter()
+            fn()
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+def report(label, elapsed, latencies):
+    latencies = sorted(l * 1000 for l in latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<22} {len(latencies) / elapsed:9.0f} writes/s  p50={statistics.median(latencies):7.1f}ms  p95={p95:7.1f}ms")
+
+def main(args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        # Commit per request, the default path
+        engine, vehicle_id = setup(os.path.join(tmp, "direct.db"))
+        Session = sessionmaker(bind=engine)
+        op = fuel_write(vehicle_id)
+
+        def direct():
+            db = Session()
+            try:
+                op(db)
+                db.commit()
+            finally:
+                db.close()
+        report("commit per request", *run_threads(args.threads, args.writes, direct))
+        engine.dispose()
+
+        # Group commit
+        path = os.path.join(tmp, "grouped.db")
+        engine, vehicle_id = setup(path)
+        engine.dispose()
+        writer = GroupCommitWriter(f"sqlite:///{path}", window_ms=args.window_ms)
+        writer.start()
+        op = fuel_write(vehicle_id)
+        try:
+            report(f"group commit ({args.window_ms:g}ms)", *run_threads(args.threads, args.writes, lambda: writer.submit(op).result()))
+        finally:
+            writer.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark group commit against a commit per write.")
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent writers (the request threadpool)")
+    parser.add_argument("--writes", type=int, default=50, help="Writes per thread")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--dir", default=".", help="Where to put the scratch databases; use the real data disk, not tmpfs")
+    main(parser.parse_args())
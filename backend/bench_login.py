@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import httpx
+
+# The read load is one user hammering the API; keep the per-user limiter out of the measurement
+os.environ.setdefault("FLEETNOVA_RATE_LIMIT", "0")
+# The app opens ./fleetflow.db on import: run from a scratch directory so the
+# bench admin never lands in the real database
+scratch = tempfile.TemporaryDirectory()
+os.chdir(scratch.name)
+from fastapi.concurrency import run_in_threadpool
+from app.main import app
+from app.db.session import SessionLocal
+from app.models import models
+from app.core import security
+
+# Measures /vehicles/ and /trips/ latency while a login storm is running.
+# Run it twice, with and without --legacy (hashing on Starlette's shared
+# threadpool, the old behaviour), to compare.
+
+EMAIL, PASSWORD = "bench@fleetnova.com", "bench123"
+
+def create_user():
+    db = SessionLocal()
+    db.add(models.User(email=EMAIL, hashed_password=security.get_password_hash(PASSWORD), role=models.UserRole.ADMIN))
+    db.commit()
+    db.close()
+
+async def timed(client, method, url, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    return time.perf_counter() - start, response.status_code
+
+async def read_load(client, headers, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            return await timed(client, "GET", "/vehicles/" if i % 2 else "/trips/", headers=headers)
+    return await asyncio.gather(*(one(i) for i in range(requests)))
+
+async def login_storm(client, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await timed(client, "POST", "/auth/login/access-token", data={"username": EMAIL, "password": PASSWORD})
+    return await asyncio.gather(*(one() for _ in range(logins)))
+
+def report(label, samples):
+    latencies = sorted(s[0] * 1000 for s in samples)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    codes = {}
+    for _, code in samples:
+        codes[code] = codes.get(code, 0) + 1
+    print(f"{label:<28} p50={statistics.median(latencies):8.1f}ms  p95={p95:8.1f}ms  max={latencies[-1]:8.1f}ms  status={codes}")
+
+async def main(args):
+    create_user()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/auth/login/access-token", data={"username": EMAIL, "password": PASSWORD})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        report("reads, idle", await read_load(client, headers, args.reads, args.read_concurrency))
+        storm = asyncio.create_task(login_storm(client, args.logins, args.login_concurrency))
+        await asyncio.sleep(0.05)
+        report("reads, during login storm", await read_load(client, headers, args.reads, args.read_concurrency))
+        report("logins", await storm)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--read-concurrency", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--login-concurrency", type=int, default=200)
+    parser.add_argument("--legacy", action="store_true", help="hash on the shared threadpool like before")
+    args = parser.parse_args()
+    if args.legacy:
+        security._run_hashing = lambda fn, *a: run_in_threadpool(fn, *a)
+    asyncio.run(main(args))
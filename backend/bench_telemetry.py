@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import httpx
+import numpy as np
+
+# Sustained telemetry ingest through the real endpoint, batches sent back to back.
+# Rate limiting would throttle the single bench user, so it is off here.
+os.environ.setdefault("FLEETNOVA_RATE_LIMIT", "0")
+
+parser = argparse.ArgumentParser(description="Benchmark the telemetry ingest endpoint.")
+parser.add_argument("--vehicles", type=int, default=200)
+parser.add_argument("--batch-size", type=int, default=5000)
+parser.add_argument("--batches", type=int, default=20)
+parser.add_argument("--dir", default=".", help="Where to put the scratch database; use the real data disk, not tmpfs")
+args = parser.parse_args()
+
+# The app opens ./fleetflow.db on import: run from a scratch directory so the
+# bench admin, vehicles and points never land in the real database
+scratch = tempfile.TemporaryDirectory(dir=os.path.abspath(args.dir))
+os.chdir(scratch.name)
+from app.main import app
+from app.db.session import SessionLocal
+from app.models import models
+from app.core import security
+from app.services import telemetry
+
+EMAIL, PASSWORD = "bench@fleetnova.com", "bench123"
+
+def create_fleet(vehicles):
+    db = SessionLocal()
+    db.add(models.User(email=EMAIL, hashed_password=security.get_password_hash(PASSWORD), role=models.UserRole.ADMIN))
+    fleet = [
+        models.Vehicle(name=f"Telemetry {i}", plate=f"TLM-{i}", vehicle_type=models.VehicleType.VAN, capacity=1000, acquisition_cost=1)
+        for i in range(vehicles)
+    ]
+    db.add_all(fleet)
+    db.commit()
+    ids = [vehicle.id for vehicle in fleet]
+    db.close()
+    return np.array(ids)
+
+def make_batch(vehicle_ids, size, clock):
+    # One ping per vehicle per second, vehicles reporting round-robin
+    records = np.zeros(size, dtype=telemetry.RECORD)
+    seq = np.arange(clock, clock + size)
+    records["vehicle_id"] = vehicle_ids[seq % len(vehicle_ids)]
+    records["ts"] = time.time() + seq // len(vehicle_ids)
+    records["odometer"] = 1000 + seq / len(vehicle_ids) * 0.02
+    records["latitude"] = 40.7 + (seq % 97) * 1e-4
+    records["longitude"] = -74.0 + (seq % 89) * 1e-4
+    records["fuel_level"] = 60 - (seq % 50) * 0.1
+    return records
+
+def as_ndjson(records):
+    fields = records.dtype.names
+    return "\n".join(
+        "{" + ",".join(f'"{f}": {v}' for f, v in zip(fields, row)) + "}" for row in records.tolist()
+    ).encode()
+
+async def main(args):
+    vehicle_ids = create_fleet(args.vehicles)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        response = await client.post("/auth/login/access-token", data={"username": EMAIL, "password": PASSWORD})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        for fmt in ("binary", "ndjson"):
+            bodies = []
+            for b in range(args.batches):
+                records = make_batch(vehicle_ids, args.batch_size, b * args.batch_size)
+                bodies.append(records.tobytes() if fmt == "binary" else as_ndjson(records))
+            content_type = "application/octet-stream" if fmt == "binary" else "application/x-ndjson"
+            start = time.perf_counter()
+            accepted = 0
+            for body in bodies:
+                response = await client.post("/telemetry/ingest", content=body, headers={**headers, "Content-Type": content_type})
+                response.raise_for_status()
+                accepted += response.json()["accepted"]
+            elapsed = time.perf_counter() - start
+            print(f"{fmt:<7} {accepted} points in {elapsed:.2f}s = {accepted / elapsed:,.0f} points/s ({args.batch_size} per request)")
+
+if __name__ == "__main__":
+    asyncio.run(main(args))
@@ -1,9 +1,10 @@
-from app.db.session import SessionLocal, engine, Base
+from app.db.session import SessionLocal, engine
 from app.models import models
 from app.core.security import get_password_hash
+from app.services import tenants
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    tenants.prepare_database(engine)
     db = SessionLocal()
     
     # Check if admin already exists
@@ -0,0 +1,26 @@
+import argparse
+import time
+from app.db.session import SessionLocal, all_engines, engine, open_tenant_engines
+from app.services import safety, tenants
+
+# Nightly safety score recompute. Incremental by default; --full rescores everyone.
+def main():
+    parser = argparse.ArgumentParser(description="Recompute driver safety scores from trip history.")
+    parser.add_argument("--full", action="store_true", help="rescore every driver, not just those with new trips")
+    args = parser.parse_args()
+
+    tenants.prepare_database(engine)
+    open_tenant_engines()
+    # The primary, then each tenant that has its own database
+    for bind in all_engines():
+        db = SessionLocal(bind=bind)
+        try:
+            start = time.perf_counter()
+            run = safety.run(db, incremental=not args.full)
+            mode = "incremental" if run.incremental else "full"
+            print(f"{bind.url}: {mode} run scored {run.drivers_scored} drivers in {time.perf_counter() - start:.2f}s")
+        finally:
+            db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import sqlite3
+from sqlalchemy.engine import make_url
+from app.core.config import READ_REPLICA_URLS
+from app.db.session import SQLALCHEMY_DATABASE_URL
+
+# Local stand-in for streaming replication: copy the primary SQLite file onto
+# every SQLite replica listed in FLEETNOVA_READ_REPLICA_URLS.
+def sync_replicas():
+    primary = make_url(SQLALCHEMY_DATABASE_URL)
+    if primary.get_backend_name() != "sqlite":
+        print("Primary is not SQLite; use the database's own replication.")
+        return
+    source = sqlite3.connect(primary.database)
+    for url in READ_REPLICA_URLS:
+        replica = make_url(url)
+        if replica.get_backend_name() != "sqlite":
+            print(f"Skipping {url}: not a SQLite replica")
+            continue
+        target = sqlite3.connect(replica.database)
+        source.backup(target)
+        target.close()
+        print(f"Copied {primary.database} -> {replica.database}")
+    source.close()
+
+if __name__ == "__main__":
+    sync_replicas()
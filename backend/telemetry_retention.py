@@ -0,0 +1,22 @@
+import time
+from app.db.session import SessionLocal, all_engines, engine, open_tenant_engines
+from app.services import telemetry, tenants
+
+# Run from cron (hourly is plenty): expires raw points, then minute and hour rollups,
+# per the FLEETNOVA_TELEMETRY_*_RETENTION_DAYS settings. Day rollups are kept.
+def main():
+    tenants.prepare_database(engine)
+    open_tenant_engines()
+    # The primary, then each tenant that has its own database
+    for bind in all_engines():
+        db = SessionLocal(bind=bind)
+        try:
+            start = time.perf_counter()
+            deleted = telemetry.apply_retention(db)
+            summary = ", ".join(f"{count} {name}" for name, count in deleted.items())
+            print(f"{bind.url}: deleted {summary} in {time.perf_counter() - start:.2f}s")
+        finally:
+            db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import os
+from app.core.config import TENANT_DATABASE_DIR
+from app.db.session import SessionLocal, engine
+from app.models import models
+from app.services import tenants
+
+# Tenants share the primary database until they are big enough to deserve
+# their own: `move` copies one out (stop the API first) and routes its users there.
+def main():
+    parser = argparse.ArgumentParser(description="Create tenants, assign users to them and move tenants to their own database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    create_cmd = sub.add_parser("create", help="Add a tenant in the shared database")
+    create_cmd.add_argument("slug")
+    create_cmd.add_argument("name")
+
+    sub.add_parser("list", help="Show tenants, their users and where their rows live")
+
+    assign_cmd = sub.add_parser("assign", help="Put a user in a tenant (they must log in again)")
+    assign_cmd.add_argument("email")
+    assign_cmd.add_argument("slug")
+
+    move_cmd = sub.add_parser("move", help="Move a tenant's rows to their own database")
+    move_cmd.add_argument("slug")
+    move_cmd.add_argument("--database-url", help=f"default: sqlite:///{TENANT_DATABASE_DIR}/<slug>.db")
+
+    args = parser.parse_args()
+    tenants.prepare_database(engine)
+    db = SessionLocal()
+    try:
+        if args.command == "create":
+            tenant = tenants.create(db, args.slug, args.name)
+            print(f"created tenant {tenant.slug} (id {tenant.id})")
+        elif args.command == "list":
+            for tenant in db.query(models.Tenant).order_by(models.Tenant.id):
+                users = db.query(models.User).filter(models.User.tenant_id == tenant.id).count()
+                print(f"{tenant.id}\t{tenant.slug}\t{tenant.name}\t{users} users\t{tenant.database_url or 'shared'}")
+        elif args.command == "assign":
+            tenant = db.query(models.Tenant).filter(models.Tenant.slug == args.slug).first()
+            user = db.query(models.User).filter(models.User.email == args.email).first()
+            if tenant is None or user is None:
+                raise SystemExit("unknown tenant or user")
+            user.tenant_id = tenant.id
+            db.commit()
+            print(f"{user.email} -> {tenant.slug}")
+        else:
+            url = args.database_url
+            if url is None:
+                os.makedirs(TENANT_DATABASE_DIR, exist_ok=True)
+                url = f"sqlite:///{TENANT_DATABASE_DIR}/{args.slug}.db"
+            try:
+                moved = tenants.move(db, args.slug, url)
+            except (LookupError, ValueError) as exc:
+                raise SystemExit(str(exc))
+            for table, count in moved.items():
+                print(f"{table}: moved {count} rows")
+            print(f"{args.slug} now lives in {url}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,155 @@
-from PIL import Image
+"""Make near-white logo backgrounds transparent, crop, and emit resized PNG/WebP variants.
+
+    python remove_bg.py fleetnova-logo.jpg -o public
+    python remove_bg.py uploads/branding/ -o public/branding --sizes 512,256,64
+
+Directories are processed in parallel and their subdirectories mirrored under
+the output directory. Inputs whose content (and the settings used) haven't
+changed since the last run are skipped, tracked in a manifest in the output
+directory.
+"""
+import argparse
+import hashlib
+import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+MANIFEST = ".remove_bg.json"
+
+
+def remove_white_background(img, threshold=230, crop=True):
+    """Return an RGBA copy of `img` with pixels above `threshold` on R, G and B made transparent."""
+    pixels = np.array(img.convert("RGBA"))
+    background = (pixels[..., :3] > threshold).all(axis=-1)
+    pixels[background] = (255, 255, 255, 0)
+
+    if crop:
+        # Crop to the bounding box of what is still visible
+        visible = pixels[..., 3] > 0
+        rows = np.flatnonzero(visible.any(axis=1))
+        cols = np.flatnonzero(visible.any(axis=0))
+        if rows.size:
+            pixels = pixels[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    return Image.fromarray(pixels, "RGBA")
+
+
+def variants(img, stem, sizes=(), webp=True):
+    """(file name, image, format, save options) for the full-size image and each smaller width."""
+    images = [(stem, img)]
+    for width in sorted(set(sizes), reverse=True):
+        if width < img.width:
+            height = max(1, round(img.height * width / img.width))
+            images.append((f"{stem}-{width}", img.resize((width, height), Image.LANCZOS)))
+    for name, image in images:
+        yield f"{name}.png", image, "PNG", {"optimize": True}
+        if webp:
+            yield f"{name}.webp", image, "WEBP", {"quality": 90, "method": 6}
+
+
+def process_file(input_path, output_dir, threshold=230, sizes=(), webp=True, suffix="-transparent"):
+    """Process one image and write its variants to `output_dir`. Returns the written paths."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with Image.open(input_path) as img:
+        result = remove_white_background(img, threshold)
+    written = []
+    for name, image, fmt, options in variants(result, Path(input_path).stem + suffix, sizes, webp):
+        path = output_dir / name
+        image.save(path, fmt, **options)
+        written.append(str(path))
+    return written
+
 
-def remove_white_background(input_path, output_path):
-    img = Image.open(input_path)
-    img = img.convert("RGBA")
-    datas = img.getdata()
-    
-    newData = []
-    for item in datas:
-        # If the pixel is close to white, make it transparent
-        if item[0] > 230 and item[1] > 230 and item[2] > 230:
-            newData.append((255, 255, 255, 0))
+def _fingerprint(path, settings):
+    digest = hashlib.sha256(settings.encode())
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _collect(inputs):
+    """(input file, subdirectory of the output directory to write it to)."""
+    for item in map(Path, inputs):
+        if item.is_dir():
+            for path in sorted(p for p in item.rglob("*") if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES):
+                yield path, path.parent.relative_to(item)
+        else:
+            yield item, Path()
+
+
+def process_paths(inputs, output_dir, threshold=230, sizes=(), webp=True, suffix="-transparent", workers=None, force=False):
+    """Process files and directories on a process pool, skipping inputs seen with the same settings.
+
+    Returns {"processed": [...], "skipped": [...], "failed": {path: error}}.
+    """
+    # Absolute, so manifest entries don't depend on the working directory
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    settings = json.dumps([threshold, sorted(set(sizes)), webp, suffix])
+
+    todo, skipped, failed, targets = {}, [], {}, {}
+    for path, subdir in _collect(inputs):
+        key = str(path.resolve())
+        target = output_dir / subdir / (path.stem + suffix)
+        if targets.setdefault(target, key) != key:
+            # logo.png next to logo.jpg, or two inputs named alike: they'd overwrite each other
+            failed[str(path)] = f"output name {target} is already used by {targets[target]}"
+            continue
+        fingerprint = _fingerprint(path, settings)
+        entry = manifest.get(key)
+        if not force and entry and entry["hash"] == fingerprint and all(Path(p).exists() for p in entry["outputs"]):
+            skipped.append(str(path))
         else:
-            newData.append(item)
-            
-    img.putdata(newData)
-    
-    # Optional: Crop the image to its bounding box
-    bbox = img.getbbox()
-    if bbox:
-        img = img.crop(bbox)
-        
-    img.save(output_path, "PNG")
-    print(f"Saved transparent logo to {output_path}")
-
-input_img = r"C:\Users\barot\.gemini\antigravity\brain\4082c45b-0175-44f4-bac4-fc5dbdcb4fb3\media__1771669892281.png"
-out_img = r"c:\Odoo\frontend\public\fleetnova-logo-transparent.png"
+            todo[key] = (path, target.parent, fingerprint)
+
+    processed = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(todo))) as pool:
+            futures = {
+                key: pool.submit(process_file, path, directory, threshold, tuple(sizes), webp, suffix)
+                for key, (path, directory, _) in todo.items()
+            }
+            for key, future in futures.items():
+                path, _, fingerprint = todo[key]
+                try:
+                    manifest[key] = {"hash": fingerprint, "outputs": future.result()}
+                    processed.append(str(path))
+                except Exception as exc:
+                    failed[str(path)] = repr(exc)
+        manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return {"processed": processed, "skipped": skipped, "failed": failed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Make white logo backgrounds transparent and emit resized PNG/WebP variants.")
+    parser.add_argument("inputs", nargs="+", help="image files or directories (searched recursively)")
+    parser.add_argument("-o", "--output-dir", default="public", help="where variants are written (default: public)")
+    parser.add_argument("--threshold", type=int, default=230, help="R, G and B all above this count as background")
+    parser.add_argument("--sizes", default="512,256,128", help="comma-separated widths for downscaled variants, empty for none")
+    parser.add_argument("--no-webp", action="store_true", help="only write PNGs")
+    parser.add_argument("--suffix", default="-transparent", help="appended to each output file name")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="reprocess inputs even if unchanged")
+    args = parser.parse_args(argv)
+
+    sizes = tuple(int(s) for s in args.sizes.split(",") if s.strip())
+    result = process_paths(args.inputs, args.output_dir, args.threshold, sizes, not args.no_webp, args.suffix, args.workers, args.force)
+    for path in result["processed"]:
+        print(f"Saved variants of {path} to {args.output_dir}")
+    for path, error in result["failed"].items():
+        print(f"Failed on {path}: {error}", file=sys.stderr)
+    print(f"{len(result['processed'])} processed, {len(result['skipped'])} unchanged, {len(result['failed'])} failed")
+    return 1 if result["failed"] else 0
+
+
 if __name__ == "__main__":
-    remove_white_background(input_img, out_img)
+    sys.exit(main())